@@ -13,21 +13,19 @@ class GoogleAuthHandler:
             raise ValueError("Missing required Google OAuth environment variables")
         
         self.scopes = ['https://www.googleapis.com/auth/gmail.readonly']
+        self._client_config = {
+            "web": {
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "redirect_uris": [self.redirect_uri]
+            }
+        }
         
     def get_auth_url(self):
         """Generate Google OAuth authorization URL"""
-        flow = Flow.from_client_config(
-            {
-                "web": {
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "redirect_uris": [self.redirect_uri]
-                }
-            },
-            scopes=self.scopes
-        )
+        flow = Flow.from_client_config(self._client_config, scopes=self.scopes)
         flow.redirect_uri = self.redirect_uri
         
         authorization_url, _ = flow.authorization_url(
@@ -39,18 +37,7 @@ class GoogleAuthHandler:
     
     def exchange_code_for_token(self, code: str):
         """Exchange authorization code for access token"""
-        flow = Flow.from_client_config(
-            {
-                "web": {
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "redirect_uris": [self.redirect_uri]
-                }
-            },
-            scopes=self.scopes
-        )
+        flow = Flow.from_client_config(self._client_config, scopes=self.scopes)
         flow.redirect_uri = self.redirect_uri
         
         flow.fetch_token(code=code)
@@ -1,47 +1,197 @@
 from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import RedirectResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from typing import Dict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import uvicorn
+import asyncio
+import hashlib
+import orjson
+import time
 import os
 from dotenv import load_dotenv
 
 from auth.google_auth import GoogleAuthHandler
 from services.gmail_service import GmailService
-from services.email_parser import EmailParser
+from services.email_parser import EmailParser, parse_emails_batch
 from services.transaction_extractor import TransactionExtractor
 from services.intelligent_extractor import IntelligentExtractor
 from services.analytics_service import AnalyticsService
-from services.email_classifier import EmailClassifier
+from services.email_classifier import EmailClassifier, EmailRelevance
 from services.async_processor import AsyncEmailProcessor
 
 load_dotenv()
 
-app = FastAPI(title="Email Transaction Parser", version="1.0.0")
+# orjson encodes the large analytics/insights payloads much faster than the stdlib json
+app = FastAPI(title="Email Transaction Parser", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Initialize services
-auth_handler = GoogleAuthHandler()
-gmail_service = GmailService()
-email_parser = EmailParser()
-transaction_extractor = TransactionExtractor()
-intelligent_extractor = IntelligentExtractor()
-analytics_service = AnalyticsService()
-email_classifier = EmailClassifier()
-async_processor = AsyncEmailProcessor()
+# Services are constructed on first use and shared afterwards, so a cold
+# start only pays for the ones the incoming requests actually need
+@lru_cache(maxsize=None)
+def get_auth_handler() -> GoogleAuthHandler:
+    return GoogleAuthHandler()
+
+@lru_cache(maxsize=None)
+def get_email_parser() -> EmailParser:
+    return EmailParser()
+
+@lru_cache(maxsize=None)
+def get_transaction_extractor() -> TransactionExtractor:
+    return TransactionExtractor()
+
+@lru_cache(maxsize=None)
+def get_intelligent_extractor() -> IntelligentExtractor:
+    return IntelligentExtractor()
+
+@lru_cache(maxsize=None)
+def get_analytics_service() -> AnalyticsService:
+    return AnalyticsService()
+
+@lru_cache(maxsize=None)
+def get_email_classifier() -> EmailClassifier:
+    return EmailClassifier()
+
+@lru_cache(maxsize=None)
+def get_async_processor() -> AsyncEmailProcessor:
+    return AsyncEmailProcessor()
+
+# Worker processes for CPU-bound parsing
+PARSE_WORKERS = os.cpu_count() or 1
+
+@lru_cache(maxsize=None)
+def get_parse_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+
+# Emails per AI extraction call in the insights pipeline
+EXTRACTION_BATCH_SIZE = 5
+
+# Insights pipeline results keyed by (access token hash, max_emails): {key: (created_at, task)}
+INSIGHTS_CACHE_TTL = 600  # seconds
+INSIGHTS_CACHE_MAXSIZE = 64
+_insights_cache = {}
+
+async def _fetch_emails(access_token: str, max_emails: int = None, exclude_senders=()):
+    """Fetch raw emails on a worker thread so the event loop stays free"""
+    # Use a per-request Gmail client: the shared one would have its credentials
+    # swapped by concurrent requests while this fetch is in flight
+    gmail = GmailService()
+    gmail.set_credentials(access_token)
+    return await asyncio.to_thread(gmail.fetch_emails_last_6_months, max_emails, exclude_senders=exclude_senders)
+
+async def _parse_emails(emails):
+    """Parse raw Gmail messages across the process pool, one chunk per worker"""
+    if not emails:
+        return []
+    
+    loop = asyncio.get_running_loop()
+    chunk_size = -(-len(emails) // PARSE_WORKERS)
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(get_parse_pool(), parse_emails_batch, emails[i:i + chunk_size])
+        for i in range(0, len(emails), chunk_size)
+    ))
+    return [parsed_email for chunk in chunks for parsed_email in chunk]
+
+def _stream_insights(
+    emails,
+    counts: Dict[str, int],
+    email_parser: EmailParser,
+    email_classifier: EmailClassifier,
+    intelligent_extractor: IntelligentExtractor
+):
+    """Parse and classify one email at a time, yielding insights for relevant ones in AI batches"""
+    batch = []
+    for email in emails:
+        parsed_email = email_parser.parse_email(email)
+        relevance = email_classifier.classify_email(parsed_email)
+        counts[relevance.value] += 1
+        
+        # Process only credit card related emails
+        if relevance == EmailRelevance.PROBABLY_NOT_FINANCIAL:
+            continue
+        
+        batch.append(parsed_email)
+        if len(batch) == EXTRACTION_BATCH_SIZE:
+            yield from intelligent_extractor.extract_insights_batch(batch, batch_size=EXTRACTION_BATCH_SIZE)
+            batch = []
+    
+    if batch:
+        yield from intelligent_extractor.extract_insights_batch(batch, batch_size=EXTRACTION_BATCH_SIZE)
+
+async def _run_insights_pipeline(access_token: str, max_emails: int) -> Dict:
+    """Fetch, parse, classify and extract insights for a user's emails"""
+    email_classifier = get_email_classifier()
+    # Gmail's search drops the classifier's excluded senders up front; its -from:
+    # match is looser than the classifier's exact domain check (see GmailService)
+    emails = await _fetch_emails(access_token, max_emails, email_classifier.excluded_sender_domains)
+    
+    counts = {relevance.value: 0 for relevance in EmailRelevance}
+    insights_iter = _stream_insights(
+        emails, counts, get_email_parser(), email_classifier, get_intelligent_extractor()
+    )
+    extracted_data = await asyncio.to_thread(list, insights_iter)
+    stats = email_classifier.get_classification_stats_from_counts(counts)
+    
+    return {
+        "extracted_data": extracted_data,
+        "emails_processed": len(emails),
+        "relevant_count": stats["will_process_with_ai"],
+        "stats": stats
+    }
+
+async def _build_insights(access_token: str, max_emails: int) -> Dict:
+    """Shared insights pipeline, cached per access token.
+    
+    /insights/intelligent and /analytics/comprehensive need the same
+    extraction results; the cache holds the running task so parallel
+    requests for the same token also share a single pipeline run.
+    """
+    key = (hashlib.blake2b(access_token.encode(), digest_size=16).hexdigest(), max_emails)
+    now = time.monotonic()
+    
+    cached = _insights_cache.get(key)
+    if cached and now - cached[0] < INSIGHTS_CACHE_TTL:
+        task = cached[1]
+    else:
+        # Drop expired entries, then the oldest if still full
+        for stale_key in [k for k, (created, _) in _insights_cache.items() if now - created >= INSIGHTS_CACHE_TTL]:
+            del _insights_cache[stale_key]
+        if len(_insights_cache) >= INSIGHTS_CACHE_MAXSIZE:
+            del _insights_cache[next(iter(_insights_cache))]
+        
+        task = asyncio.create_task(_run_insights_pipeline(access_token, max_emails))
+        _insights_cache[key] = (now, task)
+    
+    try:
+        # Shield so one client disconnecting does not cancel the shared run
+        return await asyncio.shield(task)
+    except Exception:
+        if _insights_cache.get(key, (None, None))[1] is task:
+            del _insights_cache[key]
+        raise
+
+@app.on_event("shutdown")
+def shutdown_worker_pools():
+    # Only stop the pools that were ever created
+    if get_parse_pool.cache_info().currsize:
+        get_parse_pool().shutdown(wait=False, cancel_futures=True)
+    if get_async_processor.cache_info().currsize:
+        get_async_processor().shutdown()
 
 @app.get("/")
 async def root():
     return RedirectResponse(url="/static/index.html")
 
 @app.get("/auth/login")
-async def login():
+async def login(auth_handler: GoogleAuthHandler = Depends(get_auth_handler)):
     auth_url = auth_handler.get_auth_url()
     return {"auth_url": auth_url}
 
 @app.get("/auth/callback")
-async def auth_callback(code: str):
+async def auth_callback(code: str, auth_handler: GoogleAuthHandler = Depends(get_auth_handler)):
     try:
         credentials = auth_handler.exchange_code_for_token(code)
         # Redirect back to frontend with access token in URL fragment
@@ -52,122 +202,126 @@ async def auth_callback(code: str):
 @app.get("/emails/fetch")
 async def fetch_emails(access_token: str):
     try:
-        gmail_service.set_credentials(access_token)
-        emails = gmail_service.fetch_emails_last_6_months()  # No limit
-        parsed_emails = [email_parser.parse_email(email) for email in emails]
+        emails = await _fetch_emails(access_token)  # No limit
+        parsed_emails = await _parse_emails(emails)
         return {"emails": parsed_emails, "count": len(parsed_emails)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/transactions/extract")
-async def extract_transactions(access_token: str):
+async def extract_transactions(
+    access_token: str,
+    transaction_extractor: TransactionExtractor = Depends(get_transaction_extractor)
+):
     try:
-        gmail_service.set_credentials(access_token)
-        emails = gmail_service.fetch_emails_last_6_months()  # No limit
+        emails = await _fetch_emails(access_token)  # No limit
+        parsed_emails = await _parse_emails(emails)
         
-        transactions = []
-        for email in emails:
-            parsed_email = email_parser.parse_email(email)
-            extracted_transactions = transaction_extractor.extract_transactions(parsed_email)
-            transactions.extend(extracted_transactions)
+        transactions = await asyncio.to_thread(lambda: [
+            transaction
+            for parsed_email in parsed_emails
+            for transaction in transaction_extractor.extract_transactions(parsed_email)
+        ])
         
         return {"transactions": transactions, "count": len(transactions), "emails_processed": len(emails)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/insights/intelligent")
-async def extract_intelligent_insights(access_token: str):
+async def extract_intelligent_insights(access_token: str, max_emails: int = 1000):
     try:
-        gmail_service.set_credentials(access_token)
-        emails = gmail_service.fetch_emails_last_6_months()  # No limit
-        
-        # Use credit card classifier to filter emails
-        parsed_emails = [email_parser.parse_email(email) for email in emails]
-        classified = email_classifier.classify_emails_batch(parsed_emails)
-        
-        # Process only credit card related emails
-        relevant_emails = classified["definitely_financial"] + classified["maybe_financial"]
+        pipeline = await _build_insights(access_token, max_emails)
         
-        extracted_data = []
-        for parsed_email in relevant_emails:
-            insights = intelligent_extractor.extract_financial_insights(
-                parsed_email.get('bodyText', ''),
-                parsed_email.get('from', ''),
-                parsed_email.get('subject', '')
-            )
-            insights['email_id'] = parsed_email.get('id')
-            extracted_data.append(insights)
-        
-        stats = email_classifier.get_classification_stats(classified)
         return {
-            "insights": extracted_data, 
-            "emails_processed": len(emails), 
-            "credit_card_emails_analyzed": len(relevant_emails),
-            "optimization_stats": stats
+            "insights": pipeline["extracted_data"], 
+            "emails_processed": pipeline["emails_processed"], 
+            "credit_card_emails_analyzed": pipeline["relevant_count"],
+            "optimization_stats": pipeline["stats"]
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/analytics/comprehensive")
-async def get_comprehensive_analytics(access_token: str):
+async def get_comprehensive_analytics(
+    access_token: str,
+    max_emails: int = 1000,
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
     try:
-        gmail_service.set_credentials(access_token)
-        emails = gmail_service.fetch_emails_last_6_months()  # No limit
-        
-        # Use credit card classifier to filter emails
-        parsed_emails = [email_parser.parse_email(email) for email in emails]
-        classified = email_classifier.classify_emails_batch(parsed_emails)
-        
-        # Process only credit card related emails
-        relevant_emails = classified["definitely_financial"] + classified["maybe_financial"]
-        
-        extracted_data = []
-        for parsed_email in relevant_emails:
-            insights = intelligent_extractor.extract_financial_insights(
-                parsed_email.get('bodyText', ''),
-                parsed_email.get('from', ''),
-                parsed_email.get('subject', '')
-            )
-            insights['email_id'] = parsed_email.get('id')
-            extracted_data.append(insights)
+        pipeline = await _build_insights(access_token, max_emails)
         
         # Generate comprehensive analytics
-        analytics = analytics_service.generate_comprehensive_insights(extracted_data)
+        analytics = analytics_service.generate_comprehensive_insights(pipeline["extracted_data"])
         
-        stats = email_classifier.get_classification_stats(classified)
         return {
             "analytics": analytics,
             "metadata": {
-                "emails_processed": len(emails),
-                "credit_card_emails": len(relevant_emails),
-                "optimization_stats": stats,
+                "emails_processed": pipeline["emails_processed"],
+                "credit_card_emails": pipeline["relevant_count"],
+                "optimization_stats": pipeline["stats"],
                 "processing_date": "2025-08-21"
             }
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/insights/stream")
+async def stream_intelligent_insights(
+    access_token: str,
+    max_emails: int = 1000,
+    email_parser: EmailParser = Depends(get_email_parser),
+    email_classifier: EmailClassifier = Depends(get_email_classifier),
+    intelligent_extractor: IntelligentExtractor = Depends(get_intelligent_extractor)
+):
+    """Stream per-email insights as NDJSON while they are extracted"""
+    try:
+        emails = await _fetch_emails(access_token, max_emails, email_classifier.excluded_sender_domains)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def generate_insights():
+        counts = {relevance.value: 0 for relevance in EmailRelevance}
+        insights_iter = _stream_insights(
+            emails, counts, email_parser, email_classifier, intelligent_extractor
+        )
+        
+        try:
+            while True:
+                insights = await asyncio.to_thread(next, insights_iter, None)
+                if insights is None:
+                    break
+                yield orjson.dumps(insights, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+            
+            # Final line carries the run totals
+            yield orjson.dumps({
+                "emails_processed": len(emails),
+                "optimization_stats": email_classifier.get_classification_stats_from_counts(counts)
+            }) + b"\n"
+        except Exception as e:
+            yield orjson.dumps({"error": str(e)}) + b"\n"
+    
+    return StreamingResponse(generate_insights(), media_type="application/x-ndjson")
+
 # NEW OPTIMIZED ENDPOINTS
 
 @app.get("/insights/optimized")
-async def extract_optimized_insights(access_token: str, max_emails: int = 1000):
+async def extract_optimized_insights(
+    access_token: str,
+    max_emails: int = 1000,
+    email_classifier: EmailClassifier = Depends(get_email_classifier),
+    intelligent_extractor: IntelligentExtractor = Depends(get_intelligent_extractor),
+    async_processor: AsyncEmailProcessor = Depends(get_async_processor)
+):
     """Optimized AI insights with two-tier processing and batching"""
     try:
-        gmail_service.set_credentials(access_token)
-        
         # Add reasonable limit for synchronous endpoint to prevent timeouts
         print(f"Fetching emails (max: {max_emails})...")
-        emails = gmail_service.fetch_emails_last_6_months()
-        
-        # Limit emails for synchronous processing to prevent timeout
-        if len(emails) > max_emails:
-            emails = emails[:max_emails]
-            print(f"Limited to first {max_emails} emails for synchronous processing")
+        emails = await _fetch_emails(access_token, max_emails, email_classifier.excluded_sender_domains)
         
         print(f"Processing {len(emails)} emails...")
         
         # Step 1: Parse emails
-        parsed_emails = [email_parser.parse_email(email) for email in emails]
+        parsed_emails = await _parse_emails(emails)
         
         # Step 2: Two-tier classification
         classified = email_classifier.classify_emails_batch(parsed_emails)
@@ -177,7 +331,10 @@ async def extract_optimized_insights(access_token: str, max_emails: int = 1000):
         relevant_emails = classified["definitely_financial"] + classified["maybe_financial"]
         print(f"Found {len(relevant_emails)} relevant emails to process with AI")
         
-        extracted_data = intelligent_extractor.extract_insights_batch(relevant_emails, batch_size=5)
+        # Batches fill up to AI_MAX_BATCH emails (or flush after a short wait) and run
+        # off the event loop, within the Gemini budget shared with background jobs
+        results = await async_processor.extract_insights(intelligent_extractor, relevant_emails)
+        extracted_data = [result for result in results if not isinstance(result, Exception)]
         
         return {
             "insights": extracted_data,
@@ -190,9 +347,19 @@ async def extract_optimized_insights(access_token: str, max_emails: int = 1000):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/analytics/start-async")
-async def start_async_analytics(access_token: str):
+async def start_async_analytics(
+    access_token: str,
+    email_parser: EmailParser = Depends(get_email_parser),
+    intelligent_extractor: IntelligentExtractor = Depends(get_intelligent_extractor),
+    email_classifier: EmailClassifier = Depends(get_email_classifier),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+    async_processor: AsyncEmailProcessor = Depends(get_async_processor)
+):
     """Start async comprehensive analytics processing - ALL EMAILS"""
     try:
+        # Per-job Gmail client, as in _fetch_emails: the job keeps fetching in the
+        # background, long after another request could have swapped shared credentials
+        gmail_service = GmailService()
         gmail_service.set_credentials(access_token)
         
         job_id = await async_processor.start_processing_job(
@@ -205,7 +372,7 @@ async def start_async_analytics(access_token: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/analytics/status/{job_id}")
-async def get_analytics_status(job_id: str):
+async def get_analytics_status(job_id: str, async_processor: AsyncEmailProcessor = Depends(get_async_processor)):
     """Get status of async analytics job"""
     job = async_processor.get_job_status(job_id)
     
@@ -215,7 +382,7 @@ async def get_analytics_status(job_id: str):
     return job
 
 @app.get("/analytics/stream/{job_id}")
-async def stream_analytics_progress(job_id: str):
+async def stream_analytics_progress(job_id: str, async_processor: AsyncEmailProcessor = Depends(get_async_processor)):
     """Stream real-time progress updates for analytics job"""
     async def generate_updates():
         async for update in async_processor.get_job_stream(job_id):
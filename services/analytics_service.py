@@ -1,7 +1,23 @@
 from typing import List, Dict, Any
 from collections import defaultdict, Counter
-from datetime import datetime, timedelta
-import calendar
+from datetime import datetime
+import heapq
+
+# Extracted insight sections, each analyzed from its own bucket
+INSIGHT_TYPES = ('transaction', 'income', 'subscription', 'travel', 'bills', 'investment')
+
+# Multiplier converting a subscription charge to its monthly equivalent
+MONTHLY_COST_FACTORS = {
+    'yearly': 1 / 12,
+    'monthly': 1,
+    'weekly': 4.33
+}
+
+# Health score adjustments by tier
+# savings rate: < 0 | 0-10 | > 10 | > 20
+SAVINGS_TIER_SCORES = (-20, 0, 10, 20)
+# subscription share of spending: < 10 | 10-25 | > 25
+SUBSCRIPTION_TIER_SCORES = (10, 0, -10)
 
 class AnalyticsService:
     def __init__(self):
@@ -14,15 +30,29 @@ class AnalyticsService:
             # Filter relevant data
             relevant_data = [item for item in extracted_data if item.get('is_relevant', False)]
             
+            # Partition into per-type buckets in a single pass
+            buckets = {key: [] for key in INSIGHT_TYPES}
+            for item in relevant_data:
+                for key in INSIGHT_TYPES:
+                    value = item.get(key)
+                    if value:
+                        buckets[key].append(value)
+            
+            spending_analysis = self._analyze_spending(buckets['transaction'])
+            income_analysis = self._analyze_income(buckets['income'])
+            subscription_analysis = self._analyze_subscriptions(buckets['subscription'])
+            
             insights = {
-                "spending_analysis": self._analyze_spending(relevant_data),
-                "income_analysis": self._analyze_income(relevant_data),
-                "subscription_analysis": self._analyze_subscriptions(relevant_data),
-                "travel_analysis": self._analyze_travel(relevant_data),
-                "bills_analysis": self._analyze_bills(relevant_data),
-                "investment_analysis": self._analyze_investments(relevant_data),
-                "financial_health": self._calculate_financial_health(relevant_data),
-                "summary": self._generate_summary(relevant_data)
+                "spending_analysis": spending_analysis,
+                "income_analysis": income_analysis,
+                "subscription_analysis": subscription_analysis,
+                "travel_analysis": self._analyze_travel(buckets['travel']),
+                "bills_analysis": self._analyze_bills(buckets['bills']),
+                "investment_analysis": self._analyze_investments(buckets['investment']),
+                "financial_health": self._calculate_financial_health(
+                    spending_analysis, income_analysis, subscription_analysis
+                ),
+                "summary": self._generate_summary(relevant_data, buckets)
             }
             
             return insights
@@ -40,10 +70,9 @@ class AnalyticsService:
                 "summary": {"total_emails_analyzed": len(extracted_data), "financial_emails_found": 0, "transactions_extracted": 0, "income_entries_found": 0, "subscriptions_identified": 0, "analysis_date": "2025-08-20"}
             }
     
-    def _analyze_spending(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_spending(self, transactions: List[Dict]) -> Dict[str, Any]:
         """Analyze spending patterns"""
         try:
-            transactions = [item['transaction'] for item in data if item.get('transaction')]
             expenses = [t for t in transactions if t and t.get('transaction_type') == 'expense' and t.get('amount')]
             
             if not expenses:
@@ -53,25 +82,27 @@ class AnalyticsService:
             category_spending = defaultdict(float)
             monthly_spending = defaultdict(float)
             merchant_spending = defaultdict(float)
+            total_spending = 0
+            highest_amount = 0
             
             for expense in expenses:
                 amount = expense.get('amount', 0)
                 category = expense.get('category', 'Other')
                 merchant = expense.get('merchant', 'Unknown')
-                date_str = expense.get('date', '')
+                date_str = expense.get('date') or ''
                 
                 category_spending[category] += amount
                 merchant_spending[merchant] += amount
+                total_spending += amount
+                if amount > highest_amount:
+                    highest_amount = amount
                 
-                if date_str:
-                    try:
-                        month_key = datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y-%m')
-                        monthly_spending[month_key] += amount
-                    except ValueError:
-                        pass
+                # Dates are YYYY-MM-DD, so the month key is just the first 7 chars
+                if len(date_str) >= 10 and date_str[4] == '-' and date_str[7] == '-':
+                    monthly_spending[date_str[:7]] += amount
             
             # Top merchants
-            top_merchants = dict(sorted(merchant_spending.items(), key=lambda x: x[1], reverse=True)[:10])
+            top_merchants = dict(heapq.nlargest(10, merchant_spending.items(), key=lambda x: x[1]))
             
             # Calculate average monthly spending
             if monthly_spending:
@@ -80,45 +111,48 @@ class AnalyticsService:
                 avg_monthly = 0
             
             return {
-                "total_spending": sum(expense.get('amount', 0) for expense in expenses),
+                "total_spending": total_spending,
                 "category_breakdown": dict(category_spending),
                 "monthly_trend": dict(monthly_spending),
                 "top_merchants": top_merchants,
                 "average_monthly_spending": round(avg_monthly, 2),
-                "highest_single_transaction": max((e.get('amount', 0) for e in expenses), default=0)
+                "highest_single_transaction": highest_amount
             }
         except Exception as e:
             print(f"Error in spending analysis: {e}")
             return {"total_spending": 0, "category_breakdown": {}, "monthly_trend": {}, "top_merchants": {}, "average_monthly_spending": 0, "highest_single_transaction": 0}
     
-    def _analyze_income(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_income(self, income_data: List[Dict]) -> Dict[str, Any]:
         """Analyze income patterns"""
         try:
-            income_data = [item['income'] for item in data if item.get('income')]
-            
             if not income_data:
                 return {"total_income": 0, "employers": [], "pay_cycles": {}, "monthly_income_trend": {}, "average_monthly_income": 0}
             
-            employers = list(set(inc.get('employer') for inc in income_data if inc.get('employer')))
-            pay_cycles = Counter(inc.get('pay_cycle') for inc in income_data if inc.get('pay_cycle'))
-            
-            total_income = sum(inc.get('amount', 0) for inc in income_data)
+            # Group employers, pay cycles and totals in one pass
+            total_income = 0
+            employers = set()
+            pay_cycles = Counter()
             monthly_income = defaultdict(float)
             
             for inc in income_data:
-                date_str = inc.get('date', '')
-                if date_str:
-                    try:
-                        month_key = datetime.strptime(date_str, '%Y-%m-%d').strftime('%Y-%m')
-                        monthly_income[month_key] += inc.get('amount', 0)
-                    except ValueError:
-                        pass
+                employer = inc.get('employer')
+                pay_cycle = inc.get('pay_cycle')
+                amount = inc.get('amount', 0)
+                date_str = inc.get('date') or ''
+                
+                total_income += amount
+                if employer:
+                    employers.add(employer)
+                if pay_cycle:
+                    pay_cycles[pay_cycle] += 1
+                if len(date_str) >= 10 and date_str[4] == '-' and date_str[7] == '-':
+                    monthly_income[date_str[:7]] += amount
             
             avg_monthly_income = sum(monthly_income.values()) / len(monthly_income) if monthly_income else 0
             
             return {
                 "total_income": total_income,
-                "employers": employers,
+                "employers": list(employers),
                 "pay_cycles": dict(pay_cycles),
                 "monthly_income_trend": dict(monthly_income),
                 "average_monthly_income": round(avg_monthly_income, 2)
@@ -127,10 +161,8 @@ class AnalyticsService:
             print(f"Error in income analysis: {e}")
             return {"total_income": 0, "employers": [], "pay_cycles": {}, "monthly_income_trend": {}, "average_monthly_income": 0}
     
-    def _analyze_subscriptions(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_subscriptions(self, subscriptions: List[Dict]) -> Dict[str, Any]:
         """Analyze subscription patterns"""
-        subscriptions = [item['subscription'] for item in data if item.get('subscription')]
-        
         if not subscriptions:
             return {"active_subscriptions": 0, "monthly_recurring_cost": 0, "services": []}
         
@@ -138,24 +170,19 @@ class AnalyticsService:
         monthly_cost = 0
         
         for sub in subscriptions:
-            service_info = {
+            amount = sub.get('amount', 0)
+            
+            services.append({
                 "service": sub.get('service'),
-                "amount": sub.get('amount', 0),
+                "amount": amount,
                 "billing_cycle": sub.get('billing_cycle'),
                 "next_billing": sub.get('next_billing')
-            }
-            services.append(service_info)
+            })
             
             # Convert to monthly cost
-            amount = sub.get('amount', 0)
-            cycle = sub.get('billing_cycle', 'monthly')
-            
-            if cycle == 'yearly':
-                monthly_cost += amount / 12
-            elif cycle == 'monthly':
-                monthly_cost += amount
-            elif cycle == 'weekly':
-                monthly_cost += amount * 4.33
+            factor = MONTHLY_COST_FACTORS.get(sub.get('billing_cycle', 'monthly'))
+            if factor:
+                monthly_cost += amount * factor
         
         return {
             "active_subscriptions": len(subscriptions),
@@ -164,22 +191,29 @@ class AnalyticsService:
             "total_annual_cost": round(monthly_cost * 12, 2)
         }
     
-    def _analyze_travel(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_travel(self, travel_data: List[Dict]) -> Dict[str, Any]:
         """Analyze travel patterns"""
-        travel_data = [item['travel'] for item in data if item.get('travel')]
-        
         if not travel_data:
             return {"total_trips": 0, "preferred_airlines": [], "preferred_hotels": []}
         
-        airlines = [t.get('airline') for t in travel_data if t.get('airline')]
-        hotels = [t.get('hotel') for t in travel_data if t.get('hotel')]
-        destinations = [t.get('destination') for t in travel_data if t.get('destination')]
-        
-        airline_frequency = Counter(airlines)
-        hotel_frequency = Counter(hotels)
-        destination_frequency = Counter(destinations)
+        # Count airlines, hotels and destinations and total spend in one pass
+        airline_frequency = Counter()
+        hotel_frequency = Counter()
+        destination_frequency = Counter()
+        total_travel_spend = 0
         
-        total_travel_spend = sum(t.get('booking_amount', 0) for t in travel_data)
+        for trip in travel_data:
+            airline = trip.get('airline')
+            hotel = trip.get('hotel')
+            destination = trip.get('destination')
+            
+            if airline:
+                airline_frequency[airline] += 1
+            if hotel:
+                hotel_frequency[hotel] += 1
+            if destination:
+                destination_frequency[destination] += 1
+            total_travel_spend += trip.get('booking_amount', 0)
         
         return {
             "total_trips": len(travel_data),
@@ -190,15 +224,14 @@ class AnalyticsService:
             "average_trip_cost": round(total_travel_spend / len(travel_data), 2) if travel_data else 0
         }
     
-    def _analyze_bills(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_bills(self, bills_data: List[Dict]) -> Dict[str, Any]:
         """Analyze bills and utilities"""
-        bills_data = [item['bills'] for item in data if item.get('bills')]
-        
         if not bills_data:
             return {"total_bills": 0, "monthly_bill_amount": 0, "utility_breakdown": {}}
         
         utility_spending = defaultdict(float)
         providers = set()
+        total_bills = 0
         
         for bill in bills_data:
             utility_type = bill.get('utility_type', 'Other')
@@ -206,11 +239,10 @@ class AnalyticsService:
             provider = bill.get('provider')
             
             utility_spending[utility_type] += amount
+            total_bills += amount
             if provider:
                 providers.add(provider)
         
-        total_bills = sum(utility_spending.values())
-        
         return {
             "total_bills": len(bills_data),
             "monthly_bill_amount": round(total_bills, 2),
@@ -218,35 +250,45 @@ class AnalyticsService:
             "service_providers": list(providers)
         }
     
-    def _analyze_investments(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_investments(self, investment_data: List[Dict]) -> Dict[str, Any]:
         """Analyze investment patterns"""
-        investment_data = [item['investment'] for item in data if item.get('investment')]
-        
         if not investment_data:
             return {"total_investments": 0, "platforms": [], "instruments": {}}
         
-        platforms = list(set(inv.get('platform') for inv in investment_data if inv.get('platform')))
-        instruments = Counter(inv.get('instrument') for inv in investment_data if inv.get('instrument'))
+        # Group platforms, instruments and buy/sell totals in one pass
+        platforms = set()
+        instruments = Counter()
+        action_totals = defaultdict(float)
+        
+        for inv in investment_data:
+            platform = inv.get('platform')
+            instrument = inv.get('instrument')
+            
+            if platform:
+                platforms.add(platform)
+            if instrument:
+                instruments[instrument] += 1
+            action_totals[inv.get('action')] += inv.get('amount', 0)
         
-        investment_amount = sum(inv.get('amount', 0) for inv in investment_data if inv.get('action') == 'buy')
-        withdrawal_amount = sum(inv.get('amount', 0) for inv in investment_data if inv.get('action') == 'sell')
+        investment_amount = action_totals['buy']
+        withdrawal_amount = action_totals['sell']
         
         return {
             "total_investments": len(investment_data),
-            "investment_platforms": platforms,
+            "investment_platforms": list(platforms),
             "instrument_breakdown": dict(instruments),
             "total_invested": investment_amount,
             "total_withdrawn": withdrawal_amount,
             "net_investment": investment_amount - withdrawal_amount
         }
     
-    def _calculate_financial_health(self, data: List[Dict]) -> Dict[str, Any]:
-        """Calculate financial health metrics"""
-        
-        # Get spending and income
-        spending_analysis = self._analyze_spending(data)
-        income_analysis = self._analyze_income(data)
-        subscription_analysis = self._analyze_subscriptions(data)
+    def _calculate_financial_health(
+        self,
+        spending_analysis: Dict[str, Any],
+        income_analysis: Dict[str, Any],
+        subscription_analysis: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Calculate financial health metrics from already computed analyses"""
         
         avg_monthly_spending = spending_analysis.get('average_monthly_spending', 0)
         avg_monthly_income = income_analysis.get('average_monthly_income', 0)
@@ -261,21 +303,12 @@ class AnalyticsService:
         if avg_monthly_spending > 0:
             subscription_ratio = (monthly_subscriptions / avg_monthly_spending) * 100
         
-        # Financial health score (0-100)
-        health_score = 50  # Base score
-        
-        if savings_rate > 20:
-            health_score += 20
-        elif savings_rate > 10:
-            health_score += 10
-        elif savings_rate < 0:
-            health_score -= 20
-        
-        if subscription_ratio < 10:
-            health_score += 10
-        elif subscription_ratio > 25:
-            health_score -= 10
+        # Financial health score (0-100): base score plus a per-tier adjustment,
+        # where each tier index is the number of boundaries the metric has crossed
+        savings_tier = (savings_rate >= 0) + (savings_rate > 10) + (savings_rate > 20)
+        subscription_tier = (subscription_ratio >= 10) + (subscription_ratio > 25)
         
+        health_score = 50 + SAVINGS_TIER_SCORES[savings_tier] + SUBSCRIPTION_TIER_SCORES[subscription_tier]
         health_score = max(0, min(100, health_score))
         
         return {
@@ -285,15 +318,15 @@ class AnalyticsService:
             "monthly_surplus_deficit": round(avg_monthly_income - avg_monthly_spending, 2)
         }
     
-    def _generate_summary(self, data: List[Dict]) -> Dict[str, Any]:
-        """Generate executive summary"""
+    def _generate_summary(self, data: List[Dict], buckets: Dict[str, List[Dict]]) -> Dict[str, Any]:
+        """Generate executive summary from the relevant items and their per-type buckets"""
         
         total_emails_analyzed = len(data)
-        financial_emails = len([d for d in data if d.get('is_relevant')])
+        financial_emails = sum(1 for d in data if d.get('is_relevant'))
         
-        transactions = len([d for d in data if d.get('transaction')])
-        income_entries = len([d for d in data if d.get('income')])
-        subscriptions = len([d for d in data if d.get('subscription')])
+        transactions = len(buckets['transaction'])
+        income_entries = len(buckets['income'])
+        subscriptions = len(buckets['subscription'])
         
         return {
             "total_emails_analyzed": total_emails_analyzed,
@@ -301,5 +334,5 @@ class AnalyticsService:
             "transactions_extracted": transactions,
             "income_entries_found": income_entries,
             "subscriptions_identified": subscriptions,
-            "analysis_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            "analysis_date": datetime.now().isoformat(sep=' ', timespec='seconds')
         }
\ No newline at end of file
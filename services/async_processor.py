@@ -1,12 +1,261 @@
 import asyncio
-import json
-from typing import Dict, List, Optional, AsyncGenerator
+import os
+import time
+from typing import Dict, List, Optional, Tuple, AsyncGenerator
 from datetime import datetime
 import uuid
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+
+from services.insight_cache import InsightCache
+from services.intelligent_extractor import BATCH_PROMPT_BODY_CHARS, EXTRACTION_VERSION, extract_insights_batch_in_worker
+
+# Gmail batches buffered between the fetch, parse and classify stages;
+# bounds how much of the mailbox is held in memory at once
+PIPELINE_QUEUE_BATCHES = 5
+
+# Gemini request/token budgets shared by every job in this process
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+
+# Rough token estimate for a batch prompt (~4 chars per token)
+PROMPT_OVERHEAD_TOKENS = 600
+RESPONSE_TOKENS_PER_EMAIL = 250
+
+# Group-commit limits for AI extraction: flush when a batch fills or the oldest
+# email has waited max_wait. The batch stays well under Gemini's output-token
+# cap since the response carries one JSON object per email.
+AI_MAX_BATCH = 20
+AI_MAX_WAIT = 0.01
+AI_MAX_CONCURRENT_FLUSHES = 2
+
+# Worker processes for CPU-bound (rule-based) extraction; each costs ~20 MB RSS
+EXTRACT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def estimate_batch_tokens(batch: List) -> int:
+    """Estimate prompt + response tokens for one batched AI call"""
+    chars = sum(
+        len(email.get('from', '')) + len(email.get('subject', ''))
+        + min(len(email.get('bodyText', '')), BATCH_PROMPT_BODY_CHARS)
+        for email in batch
+    )
+    return PROMPT_OVERHEAD_TOKENS + chars // 4 + RESPONSE_TOKENS_PER_EMAIL * len(batch)
+
+
+class TokenBucket:
+    """Continuously refilled requests/min and tokens/min budget"""
+    
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._last_refill = time.monotonic()
+        self._lock = None
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+    
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens are available, then take them"""
+        tokens = min(tokens, self.tpm)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        # Waiters queue on the lock so capacity is handed out in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                
+                wait = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm
+                )
+                await asyncio.sleep(wait)
+
+
+class BatchDispatcher:
+    """Collects submitted emails into AI batches and flushes them from a background task"""
+    
+    def __init__(
+        self, 
+        intelligent_extractor, 
+        bucket: TokenBucket, 
+        max_batch: int = AI_MAX_BATCH, 
+        max_wait: float = AI_MAX_WAIT, 
+        max_concurrent_flushes: int = AI_MAX_CONCURRENT_FLUSHES,
+        cpu_pool: Optional[ProcessPoolExecutor] = None
+    ):
+        self.intelligent_extractor = intelligent_extractor
+        self.bucket = bucket
+        self.cpu_pool = cpu_pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._flush_slots = asyncio.Semaphore(max_concurrent_flushes)
+        self._flushes = set()
+        self._dispatcher_task = None
+    
+    def start(self):
+        self._dispatcher_task = asyncio.create_task(self._dispatch())
+    
+    async def close(self):
+        if self._dispatcher_task:
+            self._dispatcher_task.cancel()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+    
+    async def submit(self, email: Dict) -> Tuple[Dict, bool]:
+        """Queue one email and wait for its extracted insight, and whether Gemini produced it"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((email, future))
+        return await future
+    
+    def _drain(self, items: List):
+        while len(items) < self.max_batch:
+            try:
+                items.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+    
+    async def _dispatch(self):
+        while True:
+            items = [await self._queue.get()]
+            self._drain(items)
+            if len(items) < self.max_batch:
+                # Give stragglers one short window to join this batch
+                await asyncio.sleep(self.max_wait)
+                self._drain(items)
+            
+            # Waiting for a slot keeps one flush in flight while the next batch fills
+            await self._flush_slots.acquire()
+            flush = asyncio.create_task(self._flush(items))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+    
+    async def _flush(self, items: List):
+        try:
+            emails = [email for email, _ in items]
+            
+            # Only AI-backed extraction spends provider quota
+            if self.intelligent_extractor.model:
+                await self.bucket.acquire(estimate_batch_tokens(emails))
+            
+            if self.cpu_pool and self.intelligent_extractor.is_cpu_bound:
+                # Local extraction holds the GIL, so spread it across processes
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.cpu_pool, extract_insights_batch_in_worker, emails
+                )
+            else:
+                # AI calls mostly wait on HTTP, so a thread is enough
+                results = await asyncio.to_thread(
+                    self.intelligent_extractor.extract_insights_batch_with_sources, 
+                    emails, 
+                    batch_size=len(emails)
+                )
+            for index, (_, future) in enumerate(items):
+                if future.done():
+                    continue
+                if index < len(results):
+                    future.set_result(results[index])
+                else:
+                    future.set_exception(Exception("No insight returned for email"))
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._flush_slots.release()
+
+
+class Job:
+    """In-memory state of one background processing job"""
+    
+    __slots__ = (
+        "status", "progress", "total", "current_step", "start_time",
+        "updated_at_ns", "results", "error", "changed"
+    )
+    
+    def __init__(self):
+        self.status = "starting"
+        self.progress = 0
+        self.total = 0
+        self.current_step = "Initializing..."
+        self.start_time = datetime.now().isoformat()
+        self.updated_at_ns = None  # wall-clock ns; formatted only when reported
+        self.results = None
+        self.error = None
+        # Set (and replaced) on every update so stream consumers wake immediately
+        self.changed = asyncio.Event()
+    
+    @property
+    def updated_at(self) -> Optional[str]:
+        if self.updated_at_ns is None:
+            return None
+        return datetime.fromtimestamp(self.updated_at_ns / 1e9).isoformat()
+    
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+    
+    def to_dict(self) -> Dict:
+        job = {
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "current_step": self.current_step,
+            "start_time": self.start_time,
+            "results": self.results,
+            "error": self.error
+        }
+        if self.updated_at_ns is not None:
+            job["updated_at"] = self.updated_at
+        return job
+
 
 class AsyncEmailProcessor:
     def __init__(self):
-        self.jobs = {}  # Simple in-memory job storage
+        self.jobs: Dict[str, Job] = {}  # Simple in-memory job storage
+        self.bucket = TokenBucket(GEMINI_RPM, GEMINI_TPM)
+        self.insight_cache = InsightCache()
+        self.cpu_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)  # workers spawn on first use
+    
+    def shutdown(self):
+        self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+    
+    def new_dispatcher(self, intelligent_extractor) -> BatchDispatcher:
+        """Batch dispatcher drawing on this processor's shared Gemini budget and worker pool"""
+        if intelligent_extractor.is_cpu_bound:
+            return BatchDispatcher(
+                intelligent_extractor, self.bucket, 
+                max_concurrent_flushes=EXTRACT_WORKERS, cpu_pool=self.cpu_pool
+            )
+        return BatchDispatcher(intelligent_extractor, self.bucket)
+    
+    async def extract_insights(self, intelligent_extractor, emails: List[Dict]) -> List:
+        """Extract insights for emails in dispatcher batches (filled by size or time).
+        
+        Results are in email order; an email whose extraction failed has its exception instead.
+        """
+        dispatcher = self.new_dispatcher(intelligent_extractor)
+        dispatcher.start()
+        try:
+            results = await asyncio.gather(
+                *[dispatcher.submit(email) for email in emails], 
+                return_exceptions=True
+            )
+        finally:
+            await dispatcher.close()
+        return [result if isinstance(result, Exception) else result[0] for result in results]
     
     async def start_processing_job(
         self, 
@@ -21,15 +270,7 @@ class AsyncEmailProcessor:
         
         job_id = str(uuid.uuid4())
         
-        self.jobs[job_id] = {
-            "status": "starting",
-            "progress": 0,
-            "total": 0,
-            "current_step": "Initializing...",
-            "start_time": datetime.now().isoformat(),
-            "results": None,
-            "error": None
-        }
+        self.jobs[job_id] = Job()
         
         # Start background task
         asyncio.create_task(
@@ -54,77 +295,140 @@ class AsyncEmailProcessor:
         """Background async processing of emails"""
         
         try:
-            # Step 1: Fetch emails
+            # Step 1: List message IDs
             self._update_job(job_id, "running", 10, "Fetching ALL emails from Gmail (last 6 months)...")
-            emails = gmail_service.fetch_emails_last_6_months()  # No limit
+            # Cached insights are per mailbox, since message ids are only unique within one
+            mailbox = await asyncio.to_thread(gmail_service.get_mailbox_address)
+            # Gmail's search drops the classifier's excluded senders up front; its -from:
+            # match is looser than the classifier's exact domain check (see GmailService)
+            message_ids = await asyncio.to_thread(
+                gmail_service.list_message_ids_last_6_months, limit, exclude_senders=email_classifier.excluded_sender_domains
+            )
+            total_emails = len(message_ids)
             
-            self._update_job(job_id, "running", 20, f"Fetched {len(emails)} emails. Parsing content...")
+            self._update_job(job_id, "running", 20, f"Found {total_emails} emails. Fetching and parsing content...")
             
-            # Step 2: Parse emails
-            parsed_emails = []
-            for i, email in enumerate(emails):
-                parsed_email = email_parser.parse_email(email)
-                parsed_emails.append(parsed_email)
-                
-                # Update progress every 10 emails
-                if i % 10 == 0:
-                    progress = 20 + (i / len(emails)) * 30  # 20-50% for parsing
-                    self._update_job(job_id, "running", progress, f"Parsing emails... {i+1}/{len(emails)}")
+            # Steps 2-3: Fetch, parse and classify as a pipeline, so network and CPU
+            # overlap and only relevant emails are kept once classified
+            raw_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_BATCHES)
+            parsed_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_BATCHES)
+            definitely_financial, maybe_financial = [], []
+            counts = {relevance: 0 for relevance in ("definitely_financial", "maybe_financial", "probably_not")}
+            classified_count = 0
             
-            # Step 3: Classify emails (fast rule-based)
-            self._update_job(job_id, "running", 50, "Classifying emails by relevance...")
-            classified = email_classifier.classify_emails_batch(parsed_emails)
+            async def fetch_stage():
+                batches = gmail_service.iter_message_batches(message_ids)
+                while True:
+                    batch = await asyncio.to_thread(next, batches, None)
+                    if batch is None:
+                        break
+                    await raw_queue.put(batch)
+                await raw_queue.put(None)
+            
+            async def parse_stage():
+                while True:
+                    batch = await raw_queue.get()
+                    if batch is None:
+                        break
+                    parsed = await asyncio.to_thread(lambda: [email_parser.parse_email(email) for email in batch])
+                    await parsed_queue.put(parsed)
+                await parsed_queue.put(None)
+            
+            async def classify_stage():
+                nonlocal classified_count
+                while True:
+                    parsed = await parsed_queue.get()
+                    if parsed is None:
+                        break
+                    classified = email_classifier.classify_emails_batch(parsed)
+                    for category, emails in classified.items():
+                        counts[category] += len(emails)
+                    definitely_financial.extend(classified["definitely_financial"])
+                    maybe_financial.extend(classified["maybe_financial"])
+                    
+                    # Update progress once per Gmail batch
+                    classified_count += len(parsed)
+                    progress = 20 + (classified_count / total_emails) * 30  # 20-50% for fetch + parse + classify
+                    self._update_job(job_id, "running", progress, f"Parsing emails... {classified_count}/{total_emails}")
+            
+            stages = [asyncio.create_task(stage()) for stage in (fetch_stage, parse_stage, classify_stage)]
+            try:
+                await asyncio.gather(*stages)
+            except Exception:
+                # A failed stage would leave the others blocked on their queues
+                for stage in stages:
+                    stage.cancel()
+                raise
             
             # Get statistics
-            stats = email_classifier.get_classification_stats(classified)
+            stats = email_classifier.get_classification_stats_from_counts(counts)
             
             # Step 4: AI Processing (only on relevant emails)
-            relevant_emails = classified["definitely_financial"] + classified["maybe_financial"]
+            relevant_emails = definitely_financial + maybe_financial
+            # Reuse insights extracted by earlier jobs; only new emails go to the AI
+            # SQLite I/O blocks, so it runs on a thread like the Gmail and parsing steps
+            cached = await asyncio.to_thread(
+                self.insight_cache.get_many, mailbox, EXTRACTION_VERSION, [email.get('id') for email in relevant_emails]
+            )
+            pending_emails = [email for email in relevant_emails if email.get('id') not in cached]
             self._update_job(
                 job_id, "running", 60, 
-                f"Processing {len(relevant_emails)} financial emails with AI... (Skipped {stats['probably_not']} irrelevant emails)"
+                f"Processing {len(pending_emails)} financial emails with AI... (Skipped {stats['probably_not']} irrelevant emails, {len(cached)} already extracted)"
             )
             
-            # Process in batches - PARALLELIZED
-            extracted_data = []
-            batch_size = 5
-            max_concurrent_batches = 3  # Limit concurrent batches to avoid overwhelming the AI service
+            # Submit every email to the dispatcher, which groups them into AI batches
+            dispatcher = self.new_dispatcher(intelligent_extractor)
+            dispatcher.start()
+            processed_emails = 0
+            ai_insights = []
             
-            # Create all batches
-            batches = []
-            for i in range(0, len(relevant_emails), batch_size):
-                batch = relevant_emails[i:i+batch_size]
-                batches.append((i, batch))
+            async def extract(email):
+                nonlocal processed_emails
+                try:
+                    insight, from_ai = await dispatcher.submit(email)
+                    if from_ai:
+                        ai_insights.append(insight)
+                    return insight
+                finally:
+                    processed_emails += 1
+                    progress = 60 + (processed_emails / len(pending_emails)) * 30  # 60-90% for AI processing
+                    self._update_job(
+                        job_id, "running", progress, 
+                        f"AI processing... {processed_emails}/{len(pending_emails)} emails (batched processing)"
+                    )
             
-            # Process batches in parallel chunks
-            for chunk_start in range(0, len(batches), max_concurrent_batches):
-                chunk_batches = batches[chunk_start:chunk_start + max_concurrent_batches]
-                
-                # Create async tasks for concurrent processing
-                tasks = []
-                for batch_idx, batch in chunk_batches:
-                    task = self._process_batch_async(intelligent_extractor, batch, batch_idx)
-                    tasks.append(task)
-                
-                # Execute batches concurrently
-                batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Process results and update extracted_data
-                for result in batch_results:
-                    if isinstance(result, Exception):
-                        # Log error but continue processing other batches
-                        self._update_job(job_id, "running", None, f"Warning: Batch processing error - {str(result)}")
-                    else:
-                        extracted_data.extend(result)
-                
-                # Update overall progress after each chunk
-                processed_emails = min(chunk_start + max_concurrent_batches, len(batches)) * batch_size
-                processed_emails = min(processed_emails, len(relevant_emails))
-                progress = 60 + (processed_emails / len(relevant_emails)) * 30  # 60-90% for AI processing
-                self._update_job(
-                    job_id, "running", progress, 
-                    f"AI processing... {processed_emails}/{len(relevant_emails)} emails (parallel processing)"
+            try:
+                results = await asyncio.gather(
+                    *[extract(email) for email in pending_emails], 
+                    return_exceptions=True
                 )
+            finally:
+                await dispatcher.close()
+            
+            new_insights = [result for result in results if not isinstance(result, Exception)]
+            failed = len(results) - len(new_insights)
+            if failed:
+                # Log error but keep the insights that did come back
+                self._update_job(job_id, "running", 90, f"Warning: AI extraction failed for {failed} emails")
+            
+            # Only Gemini's results are cached: rule-based ones (no model, or a
+            # rate-limited/failed call) are left for a later run to extract again
+            await asyncio.to_thread(self.insight_cache.put_many, mailbox, EXTRACTION_VERSION, ai_insights)
+            
+            if not cached:
+                # Nothing came from the cache, so the new insights are already in email order
+                extracted_data = new_insights
+            else:
+                # Merge cached and new insights back into email order
+                new_results = iter(results)
+                extracted_data = []
+                for email in relevant_emails:
+                    insight = cached.get(email.get('id'))
+                    if insight is None:
+                        insight = next(new_results)
+                        if isinstance(insight, Exception):
+                            continue
+                    extracted_data.append(insight)
             
             # Step 5: Generate analytics
             self._update_job(job_id, "running", 90, "Generating comprehensive analytics...")
@@ -136,7 +440,7 @@ class AsyncEmailProcessor:
                 "classification_stats": stats,
                 "extracted_insights": extracted_data,
                 "metadata": {
-                    "total_emails_fetched": len(emails),
+                    "total_emails_fetched": classified_count,
                     "financial_emails_processed": len(relevant_emails),
                     "ai_processing_reduction": stats.get("ai_processing_reduction", 0),
                     "processing_completed_at": datetime.now().isoformat()
@@ -148,29 +452,6 @@ class AsyncEmailProcessor:
         except Exception as e:
             self._update_job(job_id, "failed", 0, f"Error: {str(e)}", None, str(e))
     
-    async def _process_batch_async(
-        self, 
-        intelligent_extractor, 
-        batch: List, 
-        batch_idx: int
-    ) -> List:
-        """Process a single batch asynchronously"""
-        try:
-            # Add small delay to avoid overwhelming the AI service
-            if batch_idx > 0:
-                await asyncio.sleep(0.1)
-            
-            # Process the batch (this calls the synchronous method but wraps it in async)
-            batch_results = await asyncio.to_thread(
-                intelligent_extractor.extract_insights_batch, 
-                batch, 
-                batch_size=len(batch)
-            )
-            return batch_results
-        except Exception as e:
-            # Return empty list on error - error will be caught by gather()
-            raise Exception(f"Batch {batch_idx} processing failed: {str(e)}")
-    
     def _update_job(
         self, 
         job_id: str, 
@@ -181,66 +462,80 @@ class AsyncEmailProcessor:
         error: Optional[str] = None
     ):
         """Update job status"""
-        if job_id in self.jobs:
-            self.jobs[job_id].update({
-                "status": status,
-                "progress": round(progress, 1),
-                "current_step": current_step,
-                "updated_at": datetime.now().isoformat()
-            })
-            
-            if results:
-                self.jobs[job_id]["results"] = results
-            
-            if error:
-                self.jobs[job_id]["error"] = error
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        
+        job.status = status
+        if progress is not None:
+            job.progress = round(progress, 1)
+        job.current_step = current_step
+        job.updated_at_ns = time.time_ns()
+        
+        if results:
+            job.results = results
+        
+        if error:
+            job.error = error
+        
+        job.notify()
     
     def get_job_status(self, job_id: str) -> Optional[Dict]:
         """Get current job status"""
-        return self.jobs.get(job_id)
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
     
     def cleanup_old_jobs(self, max_age_hours: int = 24):
         """Clean up old completed jobs"""
         cutoff_time = datetime.now().timestamp() - (max_age_hours * 3600)
         
         jobs_to_remove = []
-        for job_id, job_data in self.jobs.items():
-            job_time = datetime.fromisoformat(job_data["start_time"]).timestamp()
-            if job_time < cutoff_time and job_data["status"] in ["completed", "failed"]:
+        for job_id, job in self.jobs.items():
+            job_time = datetime.fromisoformat(job.start_time).timestamp()
+            if job_time < cutoff_time and job.status in ["completed", "failed"]:
                 jobs_to_remove.append(job_id)
         
         for job_id in jobs_to_remove:
             del self.jobs[job_id]
     
-    async def get_job_stream(self, job_id: str) -> AsyncGenerator[str, None]:
-        """Stream job progress updates"""
+    @staticmethod
+    def _stream_line(payload: Dict) -> bytes:
+        # Analytics results can carry non-string keys (e.g. None), as in the API responses
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    
+    async def get_job_stream(self, job_id: str) -> AsyncGenerator[bytes, None]:
+        """Stream job progress updates as newline-delimited JSON"""
         last_progress = -1
         
         while True:
-            job = self.get_job_status(job_id)
+            job = self.jobs.get(job_id)
             
             if not job:
-                yield json.dumps({"error": "Job not found"}) + "\n"
+                yield self._stream_line({"error": "Job not found"})
                 break
             
+            # Grab the event before reading state so an update made while we
+            # are yielding still wakes the wait below
+            changed = job.changed
+            
             # Send update if progress changed
-            if job["progress"] != last_progress:
-                yield json.dumps({
-                    "status": job["status"],
-                    "progress": job["progress"],
-                    "current_step": job["current_step"],
-                    "updated_at": job.get("updated_at")
-                }) + "\n"
+            if job.progress != last_progress:
+                yield self._stream_line({
+                    "status": job.status,
+                    "progress": job.progress,
+                    "current_step": job.current_step,
+                    "updated_at": job.updated_at
+                })
                 
-                last_progress = job["progress"]
+                last_progress = job.progress
             
             # Break if job is done
-            if job["status"] in ["completed", "failed"]:
-                if job["status"] == "completed" and job.get("results"):
-                    yield json.dumps({"results": job["results"]}) + "\n"
-                elif job["status"] == "failed":
-                    yield json.dumps({"error": job.get("error", "Unknown error")}) + "\n"
+            if job.status in ["completed", "failed"]:
+                if job.status == "completed" and job.results:
+                    yield self._stream_line({"results": job.results})
+                elif job.status == "failed":
+                    yield self._stream_line({"error": job.error or "Unknown error"})
                 break
             
-            # Wait before next check
-            await asyncio.sleep(1)
\ No newline at end of file
+            # Wait for the next update instead of polling
+            await changed.wait()
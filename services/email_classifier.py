@@ -1,7 +1,11 @@
 import re
-from typing import List, Dict, Tuple
+import threading
+from typing import List, Dict, Optional, Tuple
 from enum import Enum
 
+# Gmail message ids are stable, so verdicts are reused across jobs
+VERDICT_CACHE_MAXSIZE = 200_000
+
 class EmailRelevance(Enum):
     DEFINITELY_FINANCIAL = "definitely_financial"
     MAYBE_FINANCIAL = "maybe_financial"
@@ -87,63 +91,201 @@ class EmailClassifier:
             # Employment related (unless charged to card)
             r'\b(salary|payroll|bonus|hr|human resources)\b(?!.*card)'
         ]
+        
+        # Sender domains that decide the verdict on their own, checked before any
+        # regex. Exact match only, so e.g. a bank's marketing subdomain still
+        # goes through the patterns above.
+        self.financial_sender_domains = {
+            'sbicard.com',      # SBI Card statements and transaction alerts
+            'hdfcbank.net',     # HDFC Bank InstaAlerts
+        }
+        self.excluded_sender_domains = {
+            'facebookmail.com', 'linkedin.com', 'twitter.com', 'instagram.com',
+            'youtube.com', 'quora.com', 'pinterest.com', 'redditmail.com',
+        }
+        
+        # Each category compiled once into a single alternation, so classifying
+        # an email is at most three searches instead of one per pattern.
+        # These stay on the stdlib re engine: the exclude patterns rely on
+        # negative lookahead, which DFA engines (Hyperscan, RE2) cannot compile.
+        self._exclude_re = self._compile_union(self.exclude_patterns)
+        self._definitely_financial_re = self._compile_union(self.definitely_financial_patterns)
+        self._maybe_financial_re = self._compile_union(self.maybe_financial_patterns)
+        
+        # Literal prefilters: a category's regex can only match if one of these
+        # substrings occurs, and plain substring checks are far cheaper than a
+        # regex search on the (majority of) emails that mention none of them
+        self._exclude_literals = self._required_literals(self.exclude_patterns)
+        self._definitely_financial_literals = self._required_literals(self.definitely_financial_patterns)
+        self._maybe_financial_literals = self._required_literals(self.maybe_financial_patterns)
+        self._classify_text = self._generate_text_classifier()
+        
+        # (email id, subject hash) -> EmailRelevance, oldest entries evicted first
+        self._verdict_cache = {}
+        self._verdict_cache_lock = threading.Lock()
+    
+    @staticmethod
+    def _compile_union(patterns: List[str]) -> re.Pattern:
+        """Compile a list of lowercase patterns into one alternation.
+        
+        No IGNORECASE: classify_email lowercases the text once up front, so
+        case folding inside the regex engine would be wasted work.
+        """
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+    
+    @classmethod
+    def _required_literals(cls, patterns: List[str]) -> Optional[Tuple[str, ...]]:
+        """Substrings of which at least one must occur for any pattern to match.
+        
+        Every pattern opens with a word-bounded group of alternatives, so the
+        leading literal of each alternative is a necessary condition. Returns
+        None when some alternative has no leading literal (no prefilter).
+        """
+        literals = []
+        for pattern in patterns:
+            group = re.match(r'\\b\(([^()]*)\)', pattern)
+            if not group:
+                return None
+            for alternative in group.group(1).split('|'):
+                literal = cls._leading_literal(alternative)
+                if not literal:
+                    return None
+                literals.append(literal.lower())
+        
+        # Drop duplicates and literals already implied by a shorter one
+        unique = list(dict.fromkeys(literals))
+        return tuple(
+            literal for literal in unique
+            if not any(other != literal and other in literal for other in unique)
+        )
+    
+    @staticmethod
+    def _leading_literal(alternative: str) -> str:
+        """Literal text an alternative must start with, up to its first regex construct"""
+        literal = []
+        i = 0
+        while i < len(alternative):
+            char = alternative[i]
+            step = 1
+            if char == '\\':
+                # Escaped punctuation is literal; classes like \d or \s end it
+                if i + 1 >= len(alternative) or alternative[i + 1].isalnum():
+                    break
+                char = alternative[i + 1]
+                step = 2
+            elif char in '.^$*+?{}[]()|':
+                break
+            
+            following = alternative[i + step:i + step + 2]
+            if following[:1] in ('*', '?') or following == '{0':
+                break  # optional char, nothing more is guaranteed
+            literal.append(char)
+            if following[:1] in ('+', '{'):
+                break  # char is present, but what follows varies
+            i += step
+        
+        return ''.join(literal)
     
     def classify_email(self, email: Dict) -> EmailRelevance:
-        """Classify email relevance using rule-based patterns"""
+        """Classify email relevance, reusing the verdict for an already seen message"""
         
-        # Combine subject, from, and first 200 chars of body
+        email_id = email.get('id')
+        if not email_id:
+            return self._classify_uncached(email)
+        
+        key = (email_id, hash(email.get('subject', '')))
+        relevance = self._verdict_cache.get(key)
+        if relevance is None:
+            relevance = self._classify_uncached(email)
+            # The classifier is shared across worker threads; evict and insert together
+            with self._verdict_cache_lock:
+                if len(self._verdict_cache) >= VERDICT_CACHE_MAXSIZE:
+                    del self._verdict_cache[next(iter(self._verdict_cache))]
+                self._verdict_cache[key] = relevance
+        return relevance
+    
+    def _classify_uncached(self, email: Dict) -> EmailRelevance:
+        """Classify email relevance using sender domain, then rule-based patterns"""
+        
+        domain = self._sender_domain(email.get('from', ''))
+        if domain in self.financial_sender_domains:
+            return EmailRelevance.DEFINITELY_FINANCIAL
+        if domain in self.excluded_sender_domains:
+            return EmailRelevance.PROBABLY_NOT_FINANCIAL
+        
+        # Combine subject, from, and first 200 chars of body, lowercased once
         text = f"{email.get('subject', '')} {email.get('from', '')} {email.get('bodyText', '')[:200]}".lower()
         
-        # Check exclude patterns first
-        for pattern in self.exclude_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return EmailRelevance.PROBABLY_NOT_FINANCIAL
+        return self._classify_text(text)
+    
+    @staticmethod
+    def _sender_domain(sender: str) -> str:
+        """Lowercased domain of a From header like 'Name <user@domain>'"""
+        if '@' not in sender:
+            return ''
+        return sender.rsplit('@', 1)[-1].split('>', 1)[0].strip().lower()
+    
+    def _generate_text_classifier(self):
+        """Generate classify(text) with each category's literal prefilter inlined.
         
-        # Check definitely financial patterns
-        for pattern in self.definitely_financial_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return EmailRelevance.DEFINITELY_FINANCIAL
+        The pattern sets are fixed once the classifier is built, so the checks
+        are written out as straight-line code: exclude first, then definitely,
+        then maybe, each as `('lit' in text or ...) and regex.search(text)`.
+        This drops the per-category generator that an any() over a literals
+        tuple would allocate on every email.
+        """
+        categories = (
+            (self._exclude_literals, self._exclude_re, EmailRelevance.PROBABLY_NOT_FINANCIAL),
+            (self._definitely_financial_literals, self._definitely_financial_re, EmailRelevance.DEFINITELY_FINANCIAL),
+            (self._maybe_financial_literals, self._maybe_financial_re, EmailRelevance.MAYBE_FINANCIAL),
+        )
         
-        # Check maybe financial patterns
-        for pattern in self.maybe_financial_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return EmailRelevance.MAYBE_FINANCIAL
+        namespace = {'NOT_FINANCIAL': EmailRelevance.PROBABLY_NOT_FINANCIAL}
+        lines = ["def classify(text):"]
+        for index, (literals, regex, relevance) in enumerate(categories):
+            namespace[f"search_{index}"] = regex.search
+            namespace[f"verdict_{index}"] = relevance
+            check = f"search_{index}(text)"
+            if literals is not None:
+                prefilter = " or ".join(f"{literal!r} in text" for literal in literals)
+                check = f"({prefilter}) and {check}"
+            lines.append(f"    if {check}:")
+            lines.append(f"        return verdict_{index}")
+        lines.append("    return NOT_FINANCIAL")
         
-        return EmailRelevance.PROBABLY_NOT_FINANCIAL
+        exec(compile("\n".join(lines), "<email_classifier>", "exec"), namespace)
+        return namespace["classify"]
     
     def classify_emails_batch(self, emails: List[Dict]) -> Dict[str, List[Dict]]:
         """Classify a batch of emails into categories"""
         
-        definitely_financial = []
-        maybe_financial = []
-        probably_not = []
+        buckets = {relevance: [] for relevance in EmailRelevance}
         
         for email in emails:
-            classification = self.classify_email(email)
-            
-            if classification == EmailRelevance.DEFINITELY_FINANCIAL:
-                definitely_financial.append(email)
-            elif classification == EmailRelevance.MAYBE_FINANCIAL:
-                maybe_financial.append(email)
-            else:
-                probably_not.append(email)
+            buckets[self.classify_email(email)].append(email)
         
-        return {
-            "definitely_financial": definitely_financial,
-            "maybe_financial": maybe_financial,
-            "probably_not": probably_not
-        }
+        return {relevance.value: bucket for relevance, bucket in buckets.items()}
     
     def get_classification_stats(self, classification_result: Dict) -> Dict:
         """Get statistics about email classification"""
         
-        total = sum(len(emails) for emails in classification_result.values())
+        return self.get_classification_stats_from_counts(
+            {category: len(emails) for category, emails in classification_result.items()}
+        )
+    
+    def get_classification_stats_from_counts(self, counts: Dict[str, int]) -> Dict:
+        """Get classification statistics from per-category email counts"""
+        
+        total = sum(counts.values())
+        definitely_financial = counts.get("definitely_financial", 0)
+        maybe_financial = counts.get("maybe_financial", 0)
+        probably_not = counts.get("probably_not", 0)
         
         return {
             "total_emails": total,
-            "definitely_financial": len(classification_result["definitely_financial"]),
-            "maybe_financial": len(classification_result["maybe_financial"]),
-            "probably_not": len(classification_result["probably_not"]),
-            "will_process_with_ai": len(classification_result["definitely_financial"]) + len(classification_result["maybe_financial"]),
-            "ai_processing_reduction": round((len(classification_result["probably_not"]) / total * 100), 1) if total > 0 else 0
+            "definitely_financial": definitely_financial,
+            "maybe_financial": maybe_financial,
+            "probably_not": probably_not,
+            "will_process_with_ai": definitely_financial + maybe_financial,
+            "ai_processing_reduction": round((probably_not / total * 100), 1) if total > 0 else 0
         }
\ No newline at end of file
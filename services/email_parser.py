@@ -1,7 +1,11 @@
 from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 import base64
 import re
 
+WHITESPACE_RE = re.compile(r'\s+')
+QUOTED_PRINTABLE_RE = re.compile(r'=\d{2}')
+
 class EmailParser:
     def __init__(self):
         pass
@@ -16,60 +20,44 @@ class EmailParser:
             'bodyText': ''
         }
         
-        # Extract headers
-        headers = email_data.get('payload', {}).get('headers', [])
-        parsed_email['from'] = self._get_header_value(headers, 'From')
-        parsed_email['subject'] = self._get_header_value(headers, 'Subject')
+        # Extract headers, lowercasing each name once (first occurrence wins)
+        headers = {}
+        for header in email_data.get('payload', {}).get('headers', []):
+            headers.setdefault(header['name'].lower(), header['value'])
+        parsed_email['from'] = headers.get('from', '')
+        parsed_email['subject'] = headers.get('subject', '')
         
         # Extract body text
         parsed_email['bodyText'] = self._extract_body_text(email_data.get('payload', {}))
         
         return parsed_email
     
-    def _get_header_value(self, headers, name):
-        """Extract header value by name"""
-        for header in headers:
-            if header['name'].lower() == name.lower():
-                return header['value']
-        return ""
-    
     def _extract_body_text(self, payload):
         """Extract text content from email payload"""
-        body_text = ""
-        
-        # Handle multipart messages
-        if 'parts' in payload:
-            for part in payload['parts']:
-                body_text += self._extract_text_from_part(part)
-        else:
-            # Single part message
-            body_text = self._extract_text_from_part(payload)
-        
-        return self._clean_text(body_text)
-    
-    def _extract_text_from_part(self, part):
-        """Extract text from a single message part"""
-        mime_type = part.get('mimeType', '')
-        
-        if mime_type == 'text/plain':
-            data = part.get('body', {}).get('data', '')
-            if data:
-                return self._decode_base64(data)
+        chunks = []
         
-        elif mime_type == 'text/html':
-            data = part.get('body', {}).get('data', '')
-            if data:
-                html_content = self._decode_base64(data)
-                return self._html_to_text(html_content)
+        # Walk the MIME tree depth-first with an explicit stack (reversed so parts
+        # come off in document order); multipart containers contribute only their children
+        stack = list(reversed(payload['parts'])) if 'parts' in payload else [payload]
+        while stack:
+            part = stack.pop()
+            mime_type = part.get('mimeType', '')
+            
+            if mime_type == 'text/plain':
+                data = part.get('body', {}).get('data', '')
+                if data:
+                    chunks.append(self._decode_base64(data))
+            
+            elif mime_type == 'text/html':
+                data = part.get('body', {}).get('data', '')
+                if data:
+                    html_content = self._decode_base64(data)
+                    chunks.append(self._html_to_text(html_content))
+            
+            elif 'parts' in part:
+                stack.extend(reversed(part['parts']))
         
-        elif 'parts' in part:
-            # Recursive for nested multipart
-            text = ""
-            for subpart in part['parts']:
-                text += self._extract_text_from_part(subpart)
-            return text
-        
-        return ""
+        return self._clean_text(''.join(chunks))
     
     def _decode_base64(self, data):
         """Decode base64 encoded data"""
@@ -81,6 +69,15 @@ class EmailParser:
     
     def _html_to_text(self, html_content):
         """Convert HTML to plain text"""
+        try:
+            # selectolax (C parser) is much faster than BeautifulSoup's html.parser;
+            # drop script/style so the text matches BeautifulSoup's get_text
+            tree = HTMLParser(html_content)
+            tree.strip_tags(['script', 'style'])
+            return tree.root.text(separator=' ', strip=True) if tree.root else ""
+        except Exception:
+            pass
+        
         try:
             soup = BeautifulSoup(html_content, 'html.parser')
             return soup.get_text(separator=' ', strip=True)
@@ -90,8 +87,14 @@ class EmailParser:
     def _clean_text(self, text):
         """Clean and normalize text content"""
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = WHITESPACE_RE.sub(' ', text)
         # Remove common email artifacts
-        text = re.sub(r'=\d{2}', '', text)  # Remove quoted-printable artifacts
+        text = QUOTED_PRINTABLE_RE.sub('', text)  # Remove quoted-printable artifacts
         text = text.strip()
-        return text
\ No newline at end of file
+        return text
+
+
+def parse_emails_batch(emails):
+    """Parse a chunk of raw Gmail messages; module-level so process pools can pickle it"""
+    parser = EmailParser()
+    return [parser.parse_email(email) for email in emails]
\ No newline at end of file
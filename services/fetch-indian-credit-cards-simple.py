@@ -1,12 +1,73 @@
-from bs4 import BeautifulSoup
-import json
+from bs4 import BeautifulSoup, SoupStrainer
+import atexit
+import orjson
+import queue
 import re
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-import time
+from selenium.common.exceptions import TimeoutException
+
+SHOW_MORE_XPATH = "//button[contains(text(), 'Show More')]"
+# Card tiles on the listing; their count grows after each "Show More" click
+CARD_XPATH = "//*[contains(@class, 'card')]"
+
+# Every card is inside <body>; skip building objects for <head>'s scripts, styles and meta tags
+PAGE_STRAINER = SoupStrainer('body')
+
+# Web fonts are never needed for scraping text; blocked at the network layer
+BLOCKED_RESOURCE_PATTERNS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot']
+
+# Patterns used for every card section, compiled once
+CARD_NAME_PATTERNS = [
+    re.compile(r'([A-Z][A-Za-z\s]+Credit Card)'),
+    re.compile(r'((?:HDFC|Axis|ICICI|SBI|YES|Kotak|American Express)[A-Za-z\s]+Credit Card)'),
+]
+FEATURE_PATTERNS = [
+    re.compile(r'(\d+(?:\.\d+)?%[^.]{10,100}(?:cashback|reward|value|back))', re.IGNORECASE),
+    re.compile(r'(unlimited[^.]{10,100}(?:access|visit|lounge))', re.IGNORECASE),
+    re.compile(r'(up to[^.]{10,100}(?:₹|reward|point))', re.IGNORECASE),
+    re.compile(r'((?:complimentary|free)[^.]{10,100}(?:lounge|visit|access))', re.IGNORECASE),
+]
+# Joining and annual/renewal fee in one scan of the lowercased section text.
+# The two alternatives can't overlap (after "fee" a match holds only
+# separators and digits), so the first match of each group is the same as
+# searching for them separately.
+FEE_RE = re.compile(
+    r'joining fee[:\s]*₹?\s*(?P<joining>[0-9,]+)'
+    r'|(?:annual|renewal)\s*fee[:\s]*₹?\s*(?P<annual>[0-9,]+)'
+)
+FEE_AMOUNT_RE = re.compile(r'₹?([0-9,]+)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Listing-level phrases that mark a container or heading as not a single card
+GENERIC_SECTION_PHRASES = ('best credit cards', 'all credit cards', 'compare credit cards')
+GENERIC_HEADING_PHRASES = ('best credit cards', 'all credit cards')
+
+# Elements whose text may be a card's name, taken in document order
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b'])
+
+# Keywords in card image alt text -> category title emitted for every card that has it
+CATEGORY_KEYWORDS = tuple(
+    (keyword, keyword.title())
+    for keyword in ('travel', 'cashback', 'reward', 'premium', 'shopping', 'fuel', 'dining')
+)
+
+# Emitted on every card and in the metadata
+SOURCE = 'paisabazaar.com'
+
+# Card-name substring -> issuing bank, checked in this order
+BANK_PATTERNS = (
+    ('hdfc', 'HDFC Bank'),
+    ('axis', 'Axis Bank'),
+    ('icici', 'ICICI Bank'),
+    ('sbi', 'State Bank of India'),
+    ('yes bank', 'YES Bank'),
+    ('american express', 'American Express'),
+    ('kotak', 'Kotak Mahindra Bank'),
+)
 
 def setup_selenium_driver():
     """Setup Selenium WebDriver with Chrome options"""
@@ -17,31 +78,75 @@ def setup_selenium_driver():
     chrome_options.add_argument('--disable-gpu')
     chrome_options.add_argument('--window-size=1920,1080')
     chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    # Return from driver.get() at DOMContentLoaded instead of waiting for every
+    # image/iframe; the pagination loop waits for the content it needs itself
+    chrome_options.page_load_strategy = 'eager'
+    # Don't download images: only their src/alt attributes are scraped
+    chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
     
     try:
+        # Commands from one driver go out one at a time over a single keep-alive
+        # connection to chromedriver, so urllib3's one-connection pool is enough
         driver = webdriver.Chrome(options=chrome_options)
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_RESOURCE_PATTERNS})
         return driver
     except Exception as e:
         print(f"❌ Error setting up Chrome driver: {e}")
         return None
 
+# Idle drivers kept for reuse, so each page load doesn't pay Chrome's startup cost
+_DRIVER_POOL = queue.Queue()
+
+def get_driver():
+    """Take an idle driver from the pool, or start a new one"""
+    try:
+        return _DRIVER_POOL.get_nowait()
+    except queue.Empty:
+        return setup_selenium_driver()
+
+def release_driver(driver):
+    """Reset a driver and return it to the pool; drivers that fail to reset are quit"""
+    try:
+        driver.get('about:blank')
+        driver.delete_all_cookies()
+        _DRIVER_POOL.put(driver)
+    except Exception:
+        driver.quit()
+
+@atexit.register
+def _quit_pooled_drivers():
+    while True:
+        try:
+            _DRIVER_POOL.get_nowait().quit()
+        except queue.Empty:
+            break
+        except Exception:
+            pass
+
 def load_all_cards_with_pagination(url):
     """Load all credit cards by handling pagination with Selenium"""
-    driver = setup_selenium_driver()
+    driver = get_driver()
     if not driver:
         return None
     
+    # Explicit waits return as soon as the condition holds instead of sleeping a fixed time
+    wait = WebDriverWait(driver, 10)
+    
     try:
         print(f"🚀 Loading page: {url}")
         driver.get(url)
         
-        # Wait for page to fully load and check for content
-        time.sleep(5)
+        # Wait until the listing has rendered its "Show More" button
+        try:
+            wait.until(EC.presence_of_element_located((By.XPATH, SHOW_MORE_XPATH)))
+        except TimeoutException:
+            print("⚠️ 'Show More' button did not appear, continuing with the initial page")
         print(f"✅ Page loaded: {driver.title}")
         
-        # Check if we have content
-        all_divs = driver.find_elements(By.TAG_NAME, 'div')
-        print(f"📁 Found {len(all_divs)} div elements on page")
+        # Check if we have content (counted in the browser rather than fetching every element)
+        div_count = driver.execute_script("return document.getElementsByTagName('div').length;")
+        print(f"📁 Found {div_count} div elements on page")
         
         # Look for any elements that might contain "credit card"
         elements_with_cc = driver.find_elements(By.XPATH, "//*[contains(text(), 'Credit Card') or contains(text(), 'credit card')]")
@@ -54,34 +159,30 @@ def load_all_cards_with_pagination(url):
         
         for attempt in range(max_attempts):
             try:
-                # Wait for page to stabilize
-                time.sleep(3)
-                
-                # Try to find "Show More Cards" button
-                show_more_button = None
-                
-                try:
-                    # Look for button with "Show More Cards" text
-                    show_more_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Show More Cards')]")
-                except:
-                    try:
-                        # Fallback: look for any button with "Show More" 
-                        show_more_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Show More')]")
-                    except:
-                        print(f"❌ No 'Show More' button found on attempt {attempt + 1}")
-                        break
+                # Prefer the exact "Show More Cards" button, fall back to any "Show More"
+                buttons = (driver.find_elements(By.XPATH, "//button[contains(text(), 'Show More Cards')]")
+                           or driver.find_elements(By.XPATH, SHOW_MORE_XPATH))
+                if not buttons:
+                    print(f"❌ No 'Show More' button found on attempt {attempt + 1}")
+                    break
+                show_more_button = buttons[0]
                 
-                if show_more_button and show_more_button.is_enabled() and show_more_button.is_displayed():
-                    # Scroll to button and click
-                    driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", show_more_button)
-                    time.sleep(2)
+                if show_more_button.is_enabled() and show_more_button.is_displayed():
+                    prev_count = len(driver.find_elements(By.XPATH, CARD_XPATH))
+                    
+                    # Scroll to button (instantly, so there is no animation to wait out) and click
+                    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", show_more_button)
                     
                     # Click using JavaScript to avoid interception
                     driver.execute_script("arguments[0].click();", show_more_button)
                     print(f"✅ Clicked 'Show More Cards' button (attempt {attempt + 1})")
                     
-                    # Wait for new content to load
-                    time.sleep(5)
+                    # Wait for new cards to be appended
+                    try:
+                        wait.until(lambda d: len(d.find_elements(By.XPATH, CARD_XPATH)) > prev_count)
+                    except TimeoutException:
+                        print(f"✅ No new cards after attempt {attempt + 1}. Pagination complete")
+                        break
                     
                 else:
                     print(f"✅ No more 'Show More Cards' button available. Pagination complete after {attempt + 1} attempts")
@@ -93,7 +194,7 @@ def load_all_cards_with_pagination(url):
         
         # Get final HTML content
         html_content = driver.page_source
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = BeautifulSoup(html_content, 'lxml', parse_only=PAGE_STRAINER)  # C parser; html.parser is pure Python
         
         print("✅ Successfully loaded page with pagination")
         return soup
@@ -102,21 +203,14 @@ def load_all_cards_with_pagination(url):
         print(f"❌ Error loading page with Selenium: {e}")
         return None
     finally:
-        if driver:
-            driver.quit()
-
-def extract_image_url(img_tag):
-    """Extract image URL from img tag"""
-    if not img_tag:
-        return None
-    return img_tag.get('src', '')
+        release_driver(driver)
 
 def parse_fee_amount(fee_text):
     """Extract numeric fee amount from text like '₹10,000+ Taxes'"""
     if not fee_text:
         return None
     
-    numbers = re.findall(r'₹?([0-9,]+)', fee_text)
+    numbers = FEE_AMOUNT_RE.findall(fee_text)
     if numbers:
         try:
             return int(numbers[0].replace(',', ''))
@@ -124,6 +218,62 @@ def parse_fee_amount(fee_text):
             pass
     return None
 
+def mentions_generic_phrase(text_lower, phrases):
+    """True if the lowercased text contains any of the given listing-level phrases"""
+    # Every phrase contains 'credit cards': one scan for it rules them all out
+    # on almost every text (much cheaper than a regex alternation)
+    return 'credit cards' in text_lower and any(phrase in text_lower for phrase in phrases)
+
+def card_name_key(card_name):
+    """Dedup key for a card name: case and runs of whitespace don't make a different card"""
+    return WHITESPACE_RE.sub(' ', card_name.strip().lower())
+
+def find_card_sections(soup):
+    """Find divs that likely contain a single credit card's information, in document order.
+    
+    Returns (div, text, text_lower) tuples so extraction can reuse the text
+    computed here instead of walking each card's subtree again.
+    
+    A div's stripped text is a contiguous piece of its ancestors' text, so when a
+    div is too short, never mentions credit cards, or has no fee info, none of
+    the divs inside it can qualify either and its subtree is skipped instead of
+    having get_text() re-walk it for every nested div.
+    
+    Containers whose text matches an earlier one (typically a wrapper div around
+    the real card) are dropped here: they would resolve to the same card name and
+    be discarded after extraction anyway.
+    """
+    card_sections = []
+    seen_texts = set()
+    stack = [soup]
+    
+    while stack:
+        node = stack.pop()
+        
+        if node.name == 'div':
+            text = node.get_text(strip=True)
+            text_lower = text.lower()
+            
+            # Conditions that also rule out every nested div
+            if (len(text) <= 100 or
+                'credit card' not in text_lower or  # Must mention credit card
+                not ('joining fee' in text_lower or 'annual fee' in text_lower or '₹' in text)):  # Must have fee info
+                continue
+            
+            # Filter for divs that likely contain individual credit card information
+            if (len(text) < 2000 and  # Reasonable size
+                text.count('credit card') == 1 and  # Likely a single card container
+                # Avoid generic sections
+                not mentions_generic_phrase(text_lower, GENERIC_SECTION_PHRASES) and
+                text not in seen_texts):
+                seen_texts.add(text)
+                card_sections.append((node, text, text_lower))
+        
+        # Visit child elements next, first child on top of the stack
+        stack.extend(reversed(node.find_all(True, recursive=False)))
+    
+    return card_sections
+
 # Load the page with all cards
 url = "https://www.paisabazaar.com/credit-cards/"
 print("🚀 Starting credit card data extraction with pagination support...")
@@ -139,91 +289,67 @@ cards = []
 print("🔍 Looking for credit card containers...")
 
 # Strategy 1: Look for divs that contain credit card information
-card_sections = []
-
-# Find all divs that might contain card data
-all_divs = soup.find_all('div')
-print(f"📊 Found {len(all_divs)} total divs on page")
-
-# Look for divs with substantial content that mentions credit cards
-for div in all_divs:
-    text = div.get_text(strip=True)
-    
-    # Filter for divs that likely contain individual credit card information
-    if (len(text) > 100 and len(text) < 2000 and  # Reasonable size
-        'credit card' in text.lower() and  # Must mention credit card
-        ('joining fee' in text.lower() or 'annual fee' in text.lower() or '₹' in text) and  # Must have fee info
-        text.count('credit card') == 1):  # Likely a single card container
-        
-        # Avoid generic sections
-        if not any(generic in text.lower() for generic in ['best credit cards', 'all credit cards', 'compare credit cards']):
-            card_sections.append(div)
+# Find divs that might contain card data
+# Counted lazily: find_all('div') would build a list of every div just to take its length
+print(f"📊 Found {sum(1 for element in soup.descendants if element.name == 'div')} total divs on page")
+card_sections = find_card_sections(soup)
 
 print(f"✅ Found {len(card_sections)} potential card sections")
 
 # Extract data from each card section
 seen_cards = set()
-for i, section in enumerate(card_sections):
+for i, (section, section_text, section_text_lower) in enumerate(card_sections):
     print(f"🔄 Processing card {i+1}/{len(card_sections)}")
     
-    section_text = section.get_text(strip=True)
-    
     # Extract card name
     card_name = None
     
-    # Look for headings or strong text with card names
-    for element in section.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b']):
+    # Look for headings or strong text with card names (walked lazily: stops at the first match)
+    for element in section.descendants:
+        if element.name not in HEADING_TAGS:
+            continue
         element_text = element.get_text(strip=True)
-        if ('credit card' in element_text.lower() and 
+        element_text_lower = element_text.lower()
+        if ('credit card' in element_text_lower and 
             len(element_text) > 15 and len(element_text) < 150 and
-            not any(generic in element_text.lower() for generic in ['best credit cards', 'all credit cards'])):
+            not mentions_generic_phrase(element_text_lower, GENERIC_HEADING_PHRASES)):
             card_name = element_text
             break
     
     # Fallback: use regex to find card names
     if not card_name:
-        patterns = [
-            r'([A-Z][A-Za-z\s]+Credit Card)',
-            r'((?:HDFC|Axis|ICICI|SBI|YES|Kotak|American Express)[A-Za-z\s]+Credit Card)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, section_text)
+        for pattern in CARD_NAME_PATTERNS:
+            matches = pattern.findall(section_text)
             if matches:
                 card_name = matches[0].strip()
                 break
     
-    if not card_name or card_name in seen_cards:
+    if not card_name:
         continue
     
-    seen_cards.add(card_name)
+    card_key = card_name_key(card_name)
+    if card_key in seen_cards:
+        continue
+    
+    seen_cards.add(card_key)
     
     # Extract card image
-    card_image = None
     img_tag = section.find('img')
-    if img_tag and 'card' in img_tag.get('src', '').lower():
-        card_image = extract_image_url(img_tag)
+    src = img_tag.get('src') if img_tag else None
+    card_image = src if src and 'card' in src.lower() else None
     
     # Extract categories from images or text
     categories = []
     for img in section.find_all('img'):
         alt = img.get('alt', '').lower()
-        if any(cat in alt for cat in ['travel', 'cashback', 'reward', 'premium', 'shopping', 'fuel', 'dining']):
-            for cat in ['travel', 'cashback', 'reward', 'premium', 'shopping', 'fuel', 'dining']:
-                if cat in alt and cat.title() not in categories:
-                    categories.append(cat.title())
+        for keyword, title in CATEGORY_KEYWORDS:
+            if keyword in alt and title not in categories:
+                categories.append(title)
     
     # Extract features
     features = []
-    feature_patterns = [
-        r'(\d+(?:\.\d+)?%[^.]{10,100}(?:cashback|reward|value|back))',
-        r'(unlimited[^.]{10,100}(?:access|visit|lounge))',
-        r'(up to[^.]{10,100}(?:₹|reward|point))',
-        r'((?:complimentary|free)[^.]{10,100}(?:lounge|visit|access))',
-    ]
-    
-    for pattern in feature_patterns:
-        matches = re.findall(pattern, section_text, re.IGNORECASE)
+    for pattern in FEATURE_PATTERNS:
+        matches = pattern.findall(section_text)
         for match in matches:
             clean_match = match.strip()
             if len(clean_match) > 15 and len(clean_match) < 200 and clean_match not in features:
@@ -235,35 +361,22 @@ for i, section in enumerate(card_sections):
     joining_fee = None
     annual_fee = None
     
-    section_text_lower = section_text.lower()
+    # Extract joining and annual/renewal fee (first of each) in a single pass
+    fee_matches = {}
+    for match in FEE_RE.finditer(section_text_lower):
+        fee_matches.setdefault(match.lastgroup, match.group(match.lastgroup))
+        if len(fee_matches) == 2:
+            break
     
-    # Extract joining fee
-    joining_matches = re.findall(r'joining fee[:\s]*₹?\s*([0-9,]+)', section_text_lower)
-    if joining_matches:
-        joining_fee = parse_fee_amount(joining_matches[0])
+    if 'joining' in fee_matches:
+        joining_fee = parse_fee_amount(fee_matches['joining'])
     
-    # Extract annual/renewal fee
-    annual_matches = re.findall(r'(?:annual|renewal)\s*fee[:\s]*₹?\s*([0-9,]+)', section_text_lower)
-    if annual_matches:
-        annual_fee = parse_fee_amount(annual_matches[0])
+    if 'annual' in fee_matches:
+        annual_fee = parse_fee_amount(fee_matches['annual'])
     
     # Determine bank
-    bank = "Unknown"
-    bank_patterns = {
-        'hdfc': 'HDFC Bank',
-        'axis': 'Axis Bank',
-        'icici': 'ICICI Bank', 
-        'sbi': 'State Bank of India',
-        'yes bank': 'YES Bank',
-        'american express': 'American Express',
-        'kotak': 'Kotak Mahindra Bank',
-    }
-    
     card_name_lower = card_name.lower()
-    for pattern, bank_name in bank_patterns.items():
-        if pattern in card_name_lower:
-            bank = bank_name
-            break
+    bank = next((bank_name for pattern, bank_name in BANK_PATTERNS if pattern in card_name_lower), "Unknown")
     
     # Create card data structure
     card_data = {
@@ -276,7 +389,7 @@ for i, section in enumerate(card_sections):
         "currency": "INR",
         "categories": categories,
         "features": features,
-        "extracted_from": "paisabazaar.com"
+        "extracted_from": SOURCE
     }
     
     cards.append(card_data)
@@ -286,7 +399,7 @@ output_data = {
     "credit_cards": cards,
     "metadata": {
         "total_cards_extracted": len(cards),
-        "source": "paisabazaar.com", 
+        "source": SOURCE, 
         "extraction_date": "2025-08-22",
         "extraction_method": "Selenium pagination + BeautifulSoup parsing",
         "note": "Extracted using automated pagination to load all cards"
@@ -295,8 +408,9 @@ output_data = {
 
 # Save to JSON file
 output_filename = 'indian_credit_cards_all_paginated.json'
-with open(output_filename, 'w', encoding='utf-8') as f:
-    json.dump(output_data, f, indent=2, ensure_ascii=False)
+with open(output_filename, 'wb') as f:
+    # orjson writes UTF-8 directly (no ASCII escaping), same layout as indent=2
+    f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
 
 print(f"✅ Successfully extracted {len(cards)} credit cards")
 print(f"💾 Data saved to '{output_filename}'")
@@ -1,5 +1,5 @@
-from bs4 import BeautifulSoup
-import json
+from bs4 import BeautifulSoup, SoupStrainer
+import orjson
 import requests
 import re
 from selenium import webdriver
@@ -7,7 +7,97 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-import time
+from selenium.common.exceptions import TimeoutException
+
+# Rendered cards, counted in the browser. This is the broadest of the card
+# selectors (every exact or w-full/flex/rounded-lg card div also matches it),
+# so its count is the largest any of them would give.
+CARD_COUNT_SELECTOR = "div[class*='border'][class*='rounded']"
+# Finds the enabled, visible "Show More" button in a single round-trip (null if there is none)
+SHOW_MORE_BUTTON_SCRIPT = """
+    for (const button of document.querySelectorAll('button')) {
+        if (/show more/i.test(button.textContent) && !button.disabled && button.offsetParent) {
+            return button;
+        }
+    }
+    return null;
+"""
+
+# Web fonts are never needed for scraping text; blocked at the network layer
+BLOCKED_RESOURCE_PATTERNS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot']
+
+# Cards are only looked for inside the listing wrapper <div class="flex gap-[30px]">, so
+# parse just that subtree (skips head, nav and footer). At parse time the class
+# attribute is still the raw string, hence the split().
+CARD_LIST_STRAINER = SoupStrainer('div', class_=lambda x: bool(x) and {'flex', 'gap-[30px]'} <= set(x.split()))
+
+# Card listing structure, as CSS selectors (matched by soupsieve, no per-tag Python callbacks)
+MAIN_CONTAINER_SELECTOR = 'div.flex.gap-\\[30px\\]'
+CONTENT_CONTAINER_SELECTOR = 'div.flex.flex-col.gap-4.w-full'
+CARD_SECTION_SELECTOR = 'div.w-full.flex.border.border-\\[\\#E4E4E3\\].rounded-lg'
+CARD_SECTION_FALLBACK_SELECTOR = 'div.w-full.flex.border.rounded-lg'
+# Spans/divs whose class names mark them as category badges or tags
+CATEGORY_INDICATOR_SELECTOR = ':is(span, div):is([class*="tag" i], [class*="badge" i], [class*="category" i], [class*="label" i])'
+
+# Patterns used for every card section, compiled once
+FEE_AMOUNT_RE = re.compile(r'₹?([0-9,]+)')
+JOINING_FEE_RE = re.compile(r'joining fee[:\s]*₹?\s*([0-9,]+)')
+ANNUAL_FEE_RE = re.compile(r'(?:annual|renewal)[\s/]*fee[:\s]*₹?\s*([0-9,]+)')
+PERCENT_RE = re.compile(r'\d+(?:\.\d+)?%')
+FEATURE_PATTERNS = [
+    re.compile(r'(\d+(?:\.\d+)?%[^.]{10,100}(?:cashback|reward|value|back))', re.IGNORECASE),
+    re.compile(r'(unlimited[^.]{10,100}(?:access|visit|lounge|airport))', re.IGNORECASE),
+    re.compile(r'(up to[^.]{10,100}(?:₹|rs\.?|reward|point))', re.IGNORECASE),
+    re.compile(r'((?:complimentary|free)[^.]{10,100}(?:lounge|visit|access|membership))', re.IGNORECASE),
+    re.compile(r'(₹\s*[0-9,]+[^.]{10,100}(?:cashback|reward|voucher|credit))', re.IGNORECASE),
+    re.compile(r'([0-9]+x[^.]{10,100}(?:points|reward|miles))', re.IGNORECASE),
+]
+
+# Bold text with these words is a call to action, not a card name
+NAME_SKIP_WORDS = ('apply', 'check', 'compare', 'eligibility', 'best credit cards')
+
+# Keyword in an image's alt text or src -> category
+IMAGE_CATEGORY_KEYWORDS = {
+    'travel': 'Travel',
+    'cashback': 'Cashback',
+    'reward': 'Rewards',
+    'premium': 'Premium',
+    'shopping': 'Shopping',
+    'fuel': 'Fuel',
+    'dining': 'Dining',
+    'lifestyle': 'Lifestyle',
+    'lounge': 'Lounge Access',
+    'business': 'Business',
+    'luxury': 'Luxury'
+}
+# Keywords in category badge text (emitted title-cased)
+BADGE_CATEGORY_KEYWORDS = ('travel', 'cashback', 'rewards', 'premium', 'shopping', 'fuel', 'dining', 'lifestyle', 'lounge')
+# Keywords in element class names -> category
+CLASS_CATEGORY_KEYWORDS = tuple(
+    (keyword, keyword.title()) for keyword in ('travel', 'premium', 'reward', 'cashback', 'shopping')
+)
+
+# Words that make list items / text blocks look like card benefits, or rule them out
+LIST_FEATURE_KEYWORDS = ('cashback', 'reward', 'lounge', 'complimentary', 'free', 'discount', 'points', 'value-back', 'savings', '%')
+TEXT_FEATURE_KEYWORDS = ('cashback', 'reward', 'lounge', 'complimentary', 'free', 'unlimited', 'points', 'value-back')
+LIST_FEATURE_SKIP_WORDS = ('apply', 'check', 'compare', 'eligibility', 'terms', 'conditions')
+TEXT_FEATURE_SKIP_WORDS = LIST_FEATURE_SKIP_WORDS + ('fee',)
+
+# Card-name substring -> issuing bank, checked in this order
+BANK_PATTERNS = {
+    'hdfc': 'HDFC Bank',
+    'axis': 'Axis Bank',
+    'icici': 'ICICI Bank',
+    'sbi': 'State Bank of India',
+    'yes bank': 'YES Bank',
+    'american express': 'American Express',
+    'kotak': 'Kotak Mahindra Bank',
+    'standard chartered': 'Standard Chartered',
+    'hsbc': 'HSBC India',
+    'rbl': 'RBL Bank',
+    'indusind': 'IndusInd Bank',
+    'federal': 'Federal Bank'
+}
 
 def extract_image_url(img_tag):
     """Extract image URL from img tag using just the src attribute"""
@@ -16,13 +106,20 @@ def extract_image_url(img_tag):
     
     return img_tag.get('src', '')
 
+def is_generic_name(text_lower):
+    """True if a lowercased name candidate is a listing-level phrase rather than a single card"""
+    # Unrolled rather than any() over a tuple: this runs on every candidate div and heading
+    return ('best credit cards' in text_lower or
+            'credit card in india' in text_lower or
+            'all credit cards' in text_lower)
+
 def parse_fee_amount(fee_text):
     """Extract numeric fee amount from text like '₹10,000+ Taxes'"""
     if not fee_text:
         return None
     
     # Extract numbers from fee text
-    numbers = re.findall(r'₹?([0-9,]+)', fee_text)
+    numbers = FEE_AMOUNT_RE.findall(fee_text)
     if numbers:
         try:
             return int(numbers[0].replace(',', ''))
@@ -40,15 +137,29 @@ def setup_selenium_driver():
     chrome_options.add_argument('--disable-gpu')
     chrome_options.add_argument('--window-size=1920,1080')
     chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    # Return from driver.get() at DOMContentLoaded instead of waiting for every
+    # image/iframe; pagination waits for the content it needs itself
+    chrome_options.page_load_strategy = 'eager'
+    # Don't download images: only their src/alt attributes are scraped
+    chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
     
     try:
         driver = webdriver.Chrome(options=chrome_options)
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_RESOURCE_PATTERNS})
         return driver
     except Exception as e:
         print(f"❌ Error setting up Chrome driver: {e}")
         print("📝 Make sure ChromeDriver is installed and in PATH")
         return None
 
+def count_cards(driver):
+    """Count rendered cards with one in-browser query (no element handles sent over the wire)"""
+    try:
+        return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", CARD_COUNT_SELECTOR)
+    except Exception:
+        return 0
+
 def load_all_cards_with_pagination(url):
     """Load all credit cards by handling pagination with Selenium"""
     driver = setup_selenium_driver()
@@ -59,13 +170,13 @@ def load_all_cards_with_pagination(url):
         print(f"🚀 Loading page: {url}")
         driver.get(url)
         
-        # Wait for initial page load
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        
-        # Wait for page to fully load
-        time.sleep(3)
+        # Wait for the first cards to render (explicit waits return as soon as the condition holds)
+        try:
+            WebDriverWait(driver, 15).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, CARD_COUNT_SELECTOR))
+            )
+        except TimeoutException:
+            print("⚠️ No cards rendered yet, continuing with the page as loaded")
         print(f"✅ Page loaded: {driver.title}")
         
         # Click "Show More Cards" button repeatedly to load all 80 cards
@@ -76,70 +187,36 @@ def load_all_cards_with_pagination(url):
         
         for attempt in range(max_attempts):
             try:
-                # Wait for page to stabilize
-                time.sleep(2)
-                
-                # Count current cards using multiple strategies
-                current_cards = 0
-                card_selectors = [
-                    "div.w-full.flex.border.border-\\[\\#E4E4E3\\].rounded-lg",
-                    "div[class*='w-full'][class*='flex'][class*='border'][class*='rounded-lg']",
-                    "div[class*='border'][class*='rounded']"
-                ]
+                # Wait for the "Show More Cards" button to be usable again after the last load;
+                # the lookup itself is the wait condition, so it returns the button directly
+                try:
+                    show_more_button = WebDriverWait(driver, 5).until(
+                        lambda d: d.execute_script(SHOW_MORE_BUTTON_SCRIPT)
+                    )
+                except TimeoutException:
+                    show_more_button = None
                 
-                for selector in card_selectors:
-                    try:
-                        cards = driver.find_elements(By.CSS_SELECTOR, selector)
-                        if len(cards) > current_cards:
-                            current_cards = len(cards)
-                    except:
-                        continue
+                current_cards = count_cards(driver)
                 
                 print(f"🔄 Attempt {attempt + 1}: Found {current_cards} potential cards")
                 
-                # Find "Show More Cards" button using the exact class structure
-                show_more_button = None
-                
-                try:
-                    # Use XPath to find button with exact text
-                    show_more_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Show More Cards')]")
-                except:
-                    try:
-                        # Fallback: find button with partial text
-                        show_more_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Show More')]")
-                    except:
-                        # Final fallback: look for buttons with specific classes
-                        try:
-                            buttons = driver.find_elements(By.CSS_SELECTOR, "button.inline-flex.items-center.justify-center")
-                            for button in buttons:
-                                if "show more" in button.text.lower():
-                                    show_more_button = button
-                                    break
-                        except:
-                            pass
-                
-                if show_more_button and show_more_button.is_enabled() and show_more_button.is_displayed():
+                if show_more_button:
                     try:
-                        # Scroll to button
-                        driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", show_more_button)
-                        time.sleep(1)
+                        # Scroll to button (instantly, so there is no animation to wait out)
+                        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", show_more_button)
                         
                         # Click the button using JavaScript to avoid interception
                         driver.execute_script("arguments[0].click();", show_more_button)
                         print(f"✅ Clicked 'Show More Cards' button (attempt {attempt + 1})")
                         
-                        # Wait for new content to load
-                        time.sleep(4)
+                        # Wait for new cards to be appended
+                        try:
+                            WebDriverWait(driver, 8).until(lambda d: count_cards(d) > current_cards)
+                        except TimeoutException:
+                            pass
                         
                         # Check if more cards loaded
-                        new_card_count = 0
-                        for selector in card_selectors:
-                            try:
-                                cards = driver.find_elements(By.CSS_SELECTOR, selector)
-                                if len(cards) > new_card_count:
-                                    new_card_count = len(cards)
-                            except:
-                                continue
+                        new_card_count = count_cards(driver)
                         
                         if new_card_count <= current_cards:
                             print(f"✅ No new cards loaded. Final count: {current_cards}")
@@ -168,7 +245,10 @@ def load_all_cards_with_pagination(url):
         
         # Get final HTML content
         html_content = driver.page_source
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = BeautifulSoup(html_content, 'lxml', parse_only=CARD_LIST_STRAINER)  # C parser; html.parser is pure Python
+        if not soup.contents:
+            # No listing wrapper: parse the whole page so the debug output below can inspect it
+            soup = BeautifulSoup(html_content, 'lxml')
         
         print(f"✅ Successfully loaded page with pagination. Total cards loaded: {total_cards}")
         return soup
@@ -191,7 +271,7 @@ cards = []
 print("🔍 Looking for credit card containers using specified structure...")
 
 # First, find the main container: <div class="flex gap-[30px]">
-main_container = soup.find('div', class_=lambda x: x and isinstance(x, list) and 'flex' in x and 'gap-[30px]' in x)
+main_container = soup.select_one(MAIN_CONTAINER_SELECTOR)
 
 if not main_container:
     print("❌ Could not find main container div.flex.gap-[30px]")
@@ -200,8 +280,7 @@ else:
     print("✅ Found main container div.flex.gap-[30px]")
     
     # Within main container, find child: <div class="flex flex-col gap-4 w-full">
-    content_container = main_container.find('div', class_=lambda x: x and isinstance(x, list) and 
-                                          'flex' in x and 'flex-col' in x and 'gap-4' in x and 'w-full' in x)
+    content_container = main_container.select_one(CONTENT_CONTAINER_SELECTOR)
     
     if not content_container:
         print("❌ Could not find content container div.flex.flex-col.gap-4.w-full")
@@ -210,17 +289,14 @@ else:
         print("✅ Found content container div.flex.flex-col.gap-4.w-full")
         
         # Find all card divs: <div class="w-full flex border border-[#E4E4E3] rounded-lg">
-        card_sections = content_container.find_all('div', class_=lambda x: x and isinstance(x, list) and 
-                                                  'w-full' in x and 'flex' in x and 'border' in x and 
-                                                  'border-[#E4E4E3]' in x and 'rounded-lg' in x)
+        card_sections = content_container.select(CARD_SECTION_SELECTOR)
         
         print(f"✅ Found {len(card_sections)} card sections with exact target structure")
         
         # Fallback: if exact class match fails, try broader search within content container
         if len(card_sections) == 0:
             print("⚠️ Exact class match failed, trying broader search within content container...")
-            card_sections = content_container.find_all('div', class_=lambda x: x and isinstance(x, list) and 
-                                                      'w-full' in x and 'flex' in x and 'border' in x and 'rounded-lg' in x)
+            card_sections = content_container.select(CARD_SECTION_FALLBACK_SELECTOR)
             print(f"📋 Broader search found {len(card_sections)} card sections")
 
 # Debug: Let's see what we actually found
@@ -230,7 +306,8 @@ print(f"📋 Final card sections to process: {len(card_sections)}")
 if card_sections:
     print("🔍 Debugging: First few card sections found:")
     for i, section in enumerate(card_sections[:3]):
-        text_snippet = section.get_text(strip=True)[:200] + "..." if len(section.get_text(strip=True)) > 200 else section.get_text(strip=True)
+        section_text = section.get_text(strip=True)
+        text_snippet = section_text[:200] + "..." if len(section_text) > 200 else section_text
         print(f"   Section {i+1}: {text_snippet}")
 else:
     print("❌ No card sections found! Let's check what divs we have...")
@@ -240,7 +317,8 @@ else:
     cc_divs = [div for div in all_divs if 'credit card' in div.get_text().lower()][:5]
     print(f"   Divs mentioning 'credit card': {len(cc_divs)}")
     for i, div in enumerate(cc_divs):
-        text_snippet = div.get_text(strip=True)[:150] + "..." if len(div.get_text(strip=True)) > 150 else div.get_text(strip=True)
+        div_text = div.get_text(strip=True)
+        text_snippet = div_text[:150] + "..." if len(div_text) > 150 else div_text
         print(f"     CC Div {i+1}: {text_snippet}")
 
 # 2. Extract Card Data from all found sections
@@ -248,7 +326,9 @@ seen_cards = set()
 for i, section in enumerate(card_sections):  # Process all found cards
     print(f"🔄 Processing section {i+1}/{min(200, len(card_sections))}")
     
+    # Computed once per card and reused by every extraction step below
     section_text = section.get_text(strip=True)
+    section_text_lower = section_text.lower()
     
     # Extract Name: Look for card title in the first immediate <div>
     card_name = None
@@ -257,10 +337,11 @@ for i, section in enumerate(card_sections):  # Process all found cards
     immediate_divs = section.find_all('div', recursive=False)  # Only direct children
     for div in immediate_divs:
         text = div.get_text(strip=True)
+        text_lower = text.lower()
         # Look for text that starts with ### or contains "Credit Card"
-        if (('###' in text and 'credit card' in text.lower()) or 
-            ('credit card' in text.lower() and len(text) > 15 and len(text) < 150 and
-             not any(generic in text.lower() for generic in ['best credit cards', 'credit card in india', 'all credit cards']))):
+        if (('###' in text and 'credit card' in text_lower) or 
+            ('credit card' in text_lower and len(text) > 15 and len(text) < 150 and
+             not is_generic_name(text_lower))):
             # Clean up the name by removing ### if present
             card_name = text.replace('###', '').strip()
             break
@@ -269,9 +350,10 @@ for i, section in enumerate(card_sections):  # Process all found cards
     if not card_name:
         for heading in section.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
             heading_text = heading.get_text(strip=True)
-            if ('credit card' in heading_text.lower() and 
+            heading_text_lower = heading_text.lower()
+            if ('credit card' in heading_text_lower and 
                 len(heading_text) > 15 and len(heading_text) < 100 and
-                not any(generic in heading_text.lower() for generic in ['best credit cards', 'credit card in india', 'all credit cards'])):
+                not is_generic_name(heading_text_lower)):
                 card_name = heading_text
                 break
     
@@ -279,17 +361,20 @@ for i, section in enumerate(card_sections):  # Process all found cards
     if not card_name:
         for strong in section.find_all(['strong', 'b']):
             strong_text = strong.get_text(strip=True)
-            if ('credit card' in strong_text.lower() and 
+            strong_text_lower = strong_text.lower()
+            if ('credit card' in strong_text_lower and 
                 len(strong_text) > 15 and len(strong_text) < 100 and
-                not any(skip in strong_text.lower() for skip in ['apply', 'check', 'compare', 'eligibility', 'best credit cards'])):
+                not any(skip in strong_text_lower for skip in NAME_SKIP_WORDS)):
                 card_name = strong_text
                 break
     
     # Skip if no valid card name found or if it's too generic
-    if (not card_name or 
-        card_name in seen_cards or 
+    if not card_name:
+        continue
+    card_name_lower = card_name.lower()
+    if (card_name in seen_cards or 
         len(card_name) < 15 or
-        any(generic in card_name.lower() for generic in ['credit card', 'best credit cards', 'all credit cards']) and len(card_name) < 25):
+        any(generic in card_name_lower for generic in ['credit card', 'best credit cards', 'all credit cards']) and len(card_name) < 25):
         continue
     
     seen_cards.add(card_name)
@@ -300,10 +385,10 @@ for i, section in enumerate(card_sections):  # Process all found cards
     
     # Look for credit card specific images
     if img_tag:
-        src = img_tag.get('src', '')
+        src = img_tag.get('src', '').lower()
         # Filter for actual credit card images, not icons
-        if any(pattern in src.lower() for pattern in ['credit-card', 'card', '.png', '.jpg', '.jpeg', '.webp']):
-            if not any(icon in src.lower() for icon in ['icon', 'logo', 'symbol', 'star', 'arrow']):
+        if any(pattern in src for pattern in ['credit-card', 'card', '.png', '.jpg', '.jpeg', '.webp']):
+            if not any(icon in src for icon in ['icon', 'logo', 'symbol', 'star', 'arrow']):
                 card_image = extract_image_url(img_tag)
     
     # If no image found in section, look nearby
@@ -312,100 +397,85 @@ for i, section in enumerate(card_sections):  # Process all found cards
         parent = section.parent
         if parent:
             for img in parent.find_all('img'):
-                src = img.get('src', '')
-                if any(pattern in src.lower() for pattern in ['credit-card', 'card']) and 'png' in src.lower():
+                src = img.get('src', '').lower()
+                if any(pattern in src for pattern in ['credit-card', 'card']) and 'png' in src:
                     card_image = extract_image_url(img)
                     break
     
     # Extract Categories: Look for icons with alt text or class names like travel, premium, reward, etc.
-    categories = []
+    # Dicts keep insertion order and give O(1) membership, so they act as ordered sets
+    categories = {}
     
     # Method 1: Check icon images for category information (alt attributes)
     for img in section.find_all('img'):
-        alt = img.get('alt', '').lower()
-        src = img.get('src', '').lower()
+        # alt and src searched as one string (a keyword can't span the newline)
+        alt_and_src = f"{img.get('alt', '')}\n{img.get('src', '')}".lower()
         
-        # Category keywords to look for in alt text or src
-        category_keywords = {
-            'travel': 'Travel',
-            'cashback': 'Cashback', 
-            'reward': 'Rewards',
-            'premium': 'Premium',
-            'shopping': 'Shopping',
-            'fuel': 'Fuel',
-            'dining': 'Dining',
-            'lifestyle': 'Lifestyle',
-            'lounge': 'Lounge Access',
-            'business': 'Business',
-            'luxury': 'Luxury'
-        }
-        
-        for keyword, category in category_keywords.items():
-            if keyword in alt or keyword in src:
-                if category not in categories:
-                    categories.append(category)
+        for keyword, category in IMAGE_CATEGORY_KEYWORDS.items():
+            if keyword in alt_and_src:
+                categories[category] = None
     
     # Method 2: Look for category badges/tags in spans or divs
-    category_indicators = section.find_all(['span', 'div'], class_=lambda x: x and any(cat in ' '.join(x).lower() for cat in ['tag', 'badge', 'category', 'label']) if isinstance(x, list) else False)
+    category_indicators = section.select(CATEGORY_INDICATOR_SELECTOR)
     
     for indicator in category_indicators:
         text = indicator.get_text(strip=True).lower()
-        category_keywords = ['travel', 'cashback', 'rewards', 'premium', 'shopping', 'fuel', 'dining', 'lifestyle', 'lounge']
-        for keyword in category_keywords:
+        for keyword in BADGE_CATEGORY_KEYWORDS:
             if keyword in text:
-                categories.append(keyword.title())
+                categories[keyword.title()] = None
     
     # Method 3: Look for category information in class names of elements
     for element in section.find_all():
-        if element.get('class'):
-            class_str = ' '.join(element.get('class')).lower()
-            if any(cat in class_str for cat in ['travel', 'premium', 'reward', 'cashback', 'shopping']):
-                for cat in ['travel', 'premium', 'reward', 'cashback', 'shopping']:
-                    if cat in class_str and cat.title() not in categories:
-                        categories.append(cat.title())
+        classes = element.get('class')
+        if classes:
+            class_str = ' '.join(classes).lower()
+            # One pass over the keywords (no separate any() pre-check)
+            for keyword, category in CLASS_CATEGORY_KEYWORDS:
+                if keyword in class_str:
+                    categories[category] = None
     
     # Extract Features: Look for bullet-point benefits following icons or in subsequent divs/spans
-    features = []
+    features = {}
+    # Structured features found, counting repeats: a <ul> with one <li> yields the same text twice
+    structured_features = 0
     
     # Method 1: Look for structured bullet points or list items
     for element in section.find_all(['li', 'ul', 'ol']):
         element_text = element.get_text(strip=True)
+        element_text_lower = element_text.lower()
         if (len(element_text) > 15 and len(element_text) < 200 and
-            any(keyword in element_text.lower() for keyword in ['cashback', 'reward', 'lounge', 'complimentary', 'free', 'discount', 'points', 'value-back', 'savings', '%']) and
-            not any(skip in element_text.lower() for skip in ['apply', 'check', 'compare', 'eligibility', 'terms', 'conditions'])):
-            features.append(element_text)
+            any(keyword in element_text_lower for keyword in LIST_FEATURE_KEYWORDS) and
+            not any(skip in element_text_lower for skip in LIST_FEATURE_SKIP_WORDS)):
+            features[element_text] = None
+            structured_features += 1
     
     # Method 2: Look for spans or divs that contain benefit descriptions
     for element in section.find_all(['span', 'div']):
         element_text = element.get_text(strip=True)
+        element_text_lower = element_text.lower()
         # Look for specific benefit patterns like "3.33% value-back across all spends"
         if (len(element_text) > 20 and len(element_text) < 200 and
-            (re.search(r'\d+(?:\.\d+)?%', element_text) or  # Contains percentage
-             any(keyword in element_text.lower() for keyword in ['cashback', 'reward', 'lounge', 'complimentary', 'free', 'unlimited', 'points', 'value-back'])) and
-            not any(skip in element_text.lower() for skip in ['apply', 'check', 'compare', 'eligibility', 'terms', 'conditions', 'fee'])):
+            (PERCENT_RE.search(element_text) or  # Contains percentage
+             any(keyword in element_text_lower for keyword in TEXT_FEATURE_KEYWORDS)) and
+            not any(skip in element_text_lower for skip in TEXT_FEATURE_SKIP_WORDS)):
             if element_text not in features:  # Avoid duplicates
-                features.append(element_text)
+                features[element_text] = None
+                structured_features += 1
     
     # Method 3: Pattern matching for specific benefit formats
-    if len(features) < 3:  # If we don't have enough structured features
-        feature_patterns = [
-            r'(\d+(?:\.\d+)?%[^.]{10,100}(?:cashback|reward|value|back))',
-            r'(unlimited[^.]{10,100}(?:access|visit|lounge|airport))',
-            r'(up to[^.]{10,100}(?:₹|rs\.?|reward|point))',
-            r'((?:complimentary|free)[^.]{10,100}(?:lounge|visit|access|membership))',
-            r'(₹\s*[0-9,]+[^.]{10,100}(?:cashback|reward|voucher|credit))',
-            r'([0-9]+x[^.]{10,100}(?:points|reward|miles))'
-        ]
-        
-        for pattern in feature_patterns:
-            matches = re.findall(pattern, section_text, re.IGNORECASE)
-            for match in matches:
-                clean_match = match.strip()
-                if len(clean_match) > 15 and len(clean_match) < 150 and clean_match not in features:
-                    features.append(clean_match)
+    if structured_features < 3:  # If we don't have enough structured features
+        # Matched lazily, pattern by pattern: only the first 5 features are
+        # kept, so scanning stops once there are that many
+        matches = (match.group(1) for pattern in FEATURE_PATTERNS for match in pattern.finditer(section_text))
+        for match in matches:
+            clean_match = match.strip()
+            if len(clean_match) > 15 and len(clean_match) < 150:
+                features[clean_match] = None
+                if len(features) >= 5:
+                    break
     
-    # Remove duplicates and limit to top 5 features
-    features = list(dict.fromkeys(features))[:5]  # Preserve order while removing duplicates
+    # Limit to top 5 features (already unique, in the order found)
+    features = list(features)[:5]
     
     # Extract Fees: Look for joining and annual/renewal fee information in structured format
     joining_fee = None
@@ -418,51 +488,33 @@ for i, section in enumerate(card_sections):  # Process all found cards
         
         # Look for "Joining Fee: ₹10,000+ Taxes" pattern
         if 'joining fee' in element_text_lower:
-            joining_matches = re.findall(r'joining fee[:\s]*₹?\s*([0-9,]+)', element_text_lower)
+            joining_matches = JOINING_FEE_RE.findall(element_text_lower)
             if joining_matches and not joining_fee:
                 joining_fee = parse_fee_amount(joining_matches[0])
         
         # Look for "Annual/Renewal Fee: ..." pattern
         if any(fee_type in element_text_lower for fee_type in ['annual fee', 'renewal fee', 'annual/renewal fee']):
-            annual_matches = re.findall(r'(?:annual|renewal)[\s/]*fee[:\s]*₹?\s*([0-9,]+)', element_text_lower)
+            annual_matches = ANNUAL_FEE_RE.findall(element_text_lower)
             if annual_matches and not annual_fee:
                 annual_fee = parse_fee_amount(annual_matches[0])
     
     # Method 2: Fallback to broader text search if structured search failed
     if not joining_fee or not annual_fee:
-        section_text_lower = section_text.lower()
-        
         # Extract joining fee if not found
         if not joining_fee:
-            joining_matches = re.findall(r'joining fee[:\s]*₹?\s*([0-9,]+)', section_text_lower)
+            joining_matches = JOINING_FEE_RE.findall(section_text_lower)
             if joining_matches:
                 joining_fee = parse_fee_amount(joining_matches[0])
         
         # Extract annual/renewal fee if not found
         if not annual_fee:
-            annual_matches = re.findall(r'(?:annual|renewal)[\s/]*fee[:\s]*₹?\s*([0-9,]+)', section_text_lower)
+            annual_matches = ANNUAL_FEE_RE.findall(section_text_lower)
             if annual_matches:
                 annual_fee = parse_fee_amount(annual_matches[0])
     
     # Determine bank from card name
     bank = "Unknown"
-    bank_patterns = {
-        'hdfc': 'HDFC Bank',
-        'axis': 'Axis Bank',
-        'icici': 'ICICI Bank', 
-        'sbi': 'State Bank of India',
-        'yes bank': 'YES Bank',
-        'american express': 'American Express',
-        'kotak': 'Kotak Mahindra Bank',
-        'standard chartered': 'Standard Chartered',
-        'hsbc': 'HSBC India',
-        'rbl': 'RBL Bank',
-        'indusind': 'IndusInd Bank',
-        'federal': 'Federal Bank'
-    }
-    
-    card_name_lower = card_name.lower()
-    for pattern, bank_name in bank_patterns.items():
+    for pattern, bank_name in BANK_PATTERNS.items():
         if pattern in card_name_lower:
             bank = bank_name
             break
@@ -476,8 +528,8 @@ for i, section in enumerate(card_sections):  # Process all found cards
         "joining_fees": joining_fee,
         "annual_fees": annual_fee,
         "currency": "INR",
-        "categories": list(set(categories)) if categories else [],
-        "features": list(set(features))[:5] if features else [],  # Limit to top 5 unique features
+        "categories": list(categories),
+        "features": features,
         "extracted_from": "paisabazaar.com"
     }
     
@@ -498,8 +550,9 @@ output_data = {
 
 # Save to JSON file
 output_filename = 'indian_credit_cards_all_paginated.json'
-with open(output_filename, 'w', encoding='utf-8') as f:
-    json.dump(output_data, f, indent=2, ensure_ascii=False)
+with open(output_filename, 'wb') as f:
+    # orjson writes UTF-8 directly (no ASCII escaping), same layout as indent=2
+    f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
 
 print(f"✅ Successfully extracted {len(cards)} credit cards")
 print(f"💾 Data saved to '{output_filename}'")
@@ -1,7 +1,40 @@
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import islice
 import base64
+import threading
+import time
+
+# Gmail batch requests accept up to 100 calls, but larger batches tend to
+# trip servingLimitExceeded, so stay at 50 per batch
+BATCH_SIZE = 50
+
+# Batch requests kept in flight at once, each from its own thread
+FETCH_WORKERS = 3
+
+# Messages whose get failed (rate limit, server error) are retried in a new batch
+# request up to FETCH_RETRIES times, waiting FETCH_RETRY_BACKOFF_SECONDS, then
+# twice as long each time; any still failing fail the whole fetch
+FETCH_RETRIES = 3
+FETCH_RETRY_BACKOFF_SECONDS = 1
+
+# messages.get costs 5 quota units and Gmail allows 250 units per user per
+# second. Batch starts are spaced to use 80% of that (40 messages a second):
+# each batch spends its units in one burst, and messages.list pages and
+# retries draw on the same budget
+MESSAGES_PER_SECOND = int(250 * 0.8) // 5
+
+# Partial response mask: only what EmailParser reads (ids, date, top-level
+# headers, and the MIME tree's types and body data). Skips snippet, labels,
+# sizes and the per-part headers that make up much of a full message.
+MESSAGE_FIELDS = (
+    'id,internalDate,'
+    'payload(mimeType,headers(name,value),body/data,parts(mimeType,body/data,parts))'
+)
 
 class GmailService:
     def __init__(self):
@@ -13,56 +46,175 @@ class GmailService:
         self.credentials = Credentials(token=access_token)
         self.service = build('gmail', 'v1', credentials=self.credentials)
     
-    def fetch_emails_last_6_months(self, max_results=None, smart_sampling=False):
-        """Fetch ALL emails from the last 6 months (no limit)"""
+    def get_mailbox_address(self) -> str:
+        """Email address of the mailbox the credentials belong to"""
         if not self.service:
             raise ValueError("Gmail service not initialized. Set credentials first.")
         
-        # Calculate date 6 months ago
-        six_months_ago = datetime.now() - timedelta(days=180)
-        query = f'after:{six_months_ago.strftime("%Y/%m/%d")}'
-        
+        profile = self.service.users().getProfile(userId='me', fields='emailAddress').execute()
+        return profile['emailAddress']
+    
+    def fetch_emails_last_6_months(self, max_results=None, smart_sampling=False, exclude_senders=()):
+        """Fetch emails from the last 6 months, newest first (all of them unless max_results is set)"""
         try:
-            # Get ALL messages (no maxResults limit)
-            all_messages = []
-            page_token = None
+            message_ids = self.list_message_ids_last_6_months(max_results, exclude_senders)
             
-            while True:
-                # Fetch messages page by page
-                results = self.service.users().messages().list(
-                    userId='me',
-                    q=query,
-                    pageToken=page_token
-                ).execute()
-                
-                messages = results.get('messages', [])
-                all_messages.extend(messages)
-                
-                page_token = results.get('nextPageToken')
-                if not page_token:
-                    break
-            
-            print(f"Found {len(all_messages)} emails in last 6 months")
-            
-            # Fetch full message details for all emails
+            # Fetch full message details in batches (one HTTP round trip per batch)
             emails = []
-            for i, msg in enumerate(all_messages):
-                email_data = self.service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='full'
-                ).execute()
-                emails.append(email_data)
+            for batch in self.iter_message_batches(message_ids):
+                emails.extend(batch)
                 
                 # Progress indicator for large email volumes
-                if (i + 1) % 100 == 0:
-                    print(f"Processed {i + 1}/{len(all_messages)} emails...")
+                print(f"Processed {len(emails)}/{len(message_ids)} emails...")
             
             return emails
             
         except Exception as e:
             raise Exception(f"Error fetching emails: {str(e)}")
     
+    def list_message_ids_last_6_months(self, max_results=None, exclude_senders=()):
+        """List message IDs from the last 6 months, newest first, up to max_results if given.
+        
+        Mail matching exclude_senders (domains) is filtered out by Gmail itself, so it
+        is never listed, fetched or counted against max_results. Each becomes a
+        -from: term, which Gmail matches loosely: it also drops subdomains and any
+        From name or address containing the domain, not just that exact domain.
+        """
+        if not self.service:
+            raise ValueError("Gmail service not initialized. Set credentials first.")
+        
+        # Calculate date 6 months ago
+        six_months_ago = datetime.now() - timedelta(days=180)
+        query = f'after:{six_months_ago.strftime("%Y/%m/%d")}'
+        for sender in sorted(exclude_senders):
+            query += f' -from:{sender}'
+        
+        all_messages = []
+        page_token = None
+        
+        while True:
+            # Fetch messages page by page
+            results = self.service.users().messages().list(
+                userId='me',
+                q=query,
+                pageToken=page_token
+            ).execute()
+            
+            messages = results.get('messages', [])
+            all_messages.extend(messages)
+            
+            # Stop paging once we have enough message IDs
+            if max_results and len(all_messages) >= max_results:
+                all_messages = all_messages[:max_results]
+                break
+            
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        
+        print(f"Found {len(all_messages)} emails in last 6 months")
+        return [msg['id'] for msg in all_messages]
+    
+    def iter_message_batches(self, message_ids):
+        """Yield full messages one batch request (BATCH_SIZE IDs) at a time, in order.
+        
+        Up to FETCH_WORKERS batches are fetched ahead concurrently, paced to the
+        per-user quota. Each thread uses its own service object, since the
+        underlying httplib2 connection isn't thread-safe; the first one takes over
+        self.service, whose connection messages.list has already opened, so
+        self.service must not be used elsewhere until iteration ends.
+        
+        The service and credentials are read once, before any thread starts, so
+        a later set_credentials call can't point a running fetch at another mailbox.
+        """
+        message_ids = iter(message_ids)
+        credentials = self.credentials
+        thread_state = threading.local()
+        spare_services = [self.service]
+        pace_lock = threading.Lock()
+        next_start = time.monotonic()
+        
+        def fetch(chunk):
+            nonlocal next_start
+            with pace_lock:
+                start = max(next_start, time.monotonic())
+                next_start = start + len(chunk) / MESSAGES_PER_SECOND
+            time.sleep(max(0.0, start - time.monotonic()))
+            
+            if not hasattr(thread_state, 'service'):
+                # Each service keeps its HTTPS connection alive across that thread's batches
+                try:
+                    thread_state.service = spare_services.pop()
+                except IndexError:
+                    thread_state.service = build('gmail', 'v1', credentials=credentials)
+            return self._fetch_messages_batch(chunk, thread_state.service)
+        
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            in_flight = deque()
+            while True:
+                while len(in_flight) < FETCH_WORKERS:
+                    chunk = list(islice(message_ids, BATCH_SIZE))
+                    if not chunk:
+                        break
+                    in_flight.append(executor.submit(fetch, chunk))
+                if not in_flight:
+                    break
+                yield in_flight.popleft().result()
+    
+    def _fetch_messages_batch(self, message_ids, service=None):
+        """Fetch full message details for a chunk of IDs in a single batch request.
+        
+        Messages deleted since they were listed (404) are skipped; other failed
+        calls are retried with backoff, and raise if they never succeed.
+        """
+        service = service or self.service
+        responses = {}
+        failures = {}
+        
+        def callback(request_id, response, exception):
+            if exception is None:
+                responses[request_id] = response
+            elif isinstance(exception, HttpError) and exception.resp.status == 404:
+                print(f"Message {request_id} no longer exists, skipping")
+            else:
+                failures[request_id] = exception
+        
+        pending = list(message_ids)
+        for attempt in range(FETCH_RETRIES + 1):
+            if attempt:
+                time.sleep(FETCH_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            failures.clear()
+            
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in pending:
+                batch.add(
+                    service.users().messages().get(
+                        userId='me',
+                        id=message_id,
+                        format='full',
+                        fields=MESSAGE_FIELDS
+                    ),
+                    request_id=message_id
+                )
+            try:
+                batch.execute()
+            except HttpError as e:
+                # The batch request itself was refused: every call in it failed
+                for message_id in pending:
+                    failures.setdefault(message_id, e)
+            
+            pending = [message_id for message_id in pending if message_id in failures]
+            if not pending:
+                break
+            if attempt == FETCH_RETRIES:
+                raise Exception(
+                    f"Failed to fetch {len(pending)} messages after {FETCH_RETRIES} retries: {failures[pending[0]]}"
+                )
+            print(f"Retrying {len(pending)} messages after fetch errors, e.g.: {failures[pending[0]]}")
+        
+        # Preserve the order returned by messages.list
+        return [responses[message_id] for message_id in message_ids if message_id in responses]
+    
     def decode_email_body(self, data):
         """Decode base64 email body"""
         try:
@@ -73,7 +225,8 @@ class GmailService:
     
     def get_header_value(self, headers, name):
         """Extract header value by name"""
+        name = name.lower()
         for header in headers:
-            if header['name'].lower() == name.lower():
+            if header['name'].lower() == name:
                 return header['value']
         return ""
\ No newline at end of file
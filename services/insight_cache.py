@@ -0,0 +1,84 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List
+
+import orjson
+
+INSIGHT_CACHE_PATH = os.getenv("INSIGHT_CACHE_PATH", "insight_cache.db")
+
+# Cached insights are reused for this long, then extracted again
+INSIGHT_CACHE_TTL = int(os.getenv("INSIGHT_CACHE_TTL", str(30 * 24 * 3600)))  # seconds
+
+# Stay under SQLite's default limit on bound parameters per statement
+LOOKUP_CHUNK_SIZE = 500
+
+class InsightCache:
+    """Persistent (mailbox, email id, extraction version) -> extracted insight store.
+
+    Gmail message ids are only unique within a mailbox, so rows are keyed by a
+    hash of the mailbox address as well (the address itself is never stored),
+    and by the extraction version, so a prompt, schema or model change doesn't
+    serve insights in an older format. Rows expire after INSIGHT_CACHE_TTL.
+    """
+
+    def __init__(self, path: str = INSIGHT_CACHE_PATH, ttl: int = INSIGHT_CACHE_TTL):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._ttl = ttl
+        with self._lock, self._conn:
+            # The first version keyed rows by email id alone; none of them can be reused
+            self._conn.execute("DROP TABLE IF EXISTS insights")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS email_insights ("
+                "mailbox TEXT NOT NULL, email_id TEXT NOT NULL, version TEXT NOT NULL, "
+                "insight BLOB NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (mailbox, email_id, version))"
+            )
+
+    @staticmethod
+    def _mailbox_key(mailbox: str) -> str:
+        return hashlib.blake2b(mailbox.lower().encode(), digest_size=16).hexdigest()
+
+    def get_many(self, mailbox: str, version: str, email_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Return unexpired insights cached for whichever of the mailbox's ids have one"""
+        ids = [email_id for email_id in email_ids if email_id]
+        mailbox_key = self._mailbox_key(mailbox)
+        oldest = time.time() - self._ttl
+        found = {}
+
+        with self._lock:
+            for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+                chunk = ids[start:start + LOOKUP_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT email_id, insight FROM email_insights "
+                    f"WHERE mailbox = ? AND version = ? AND created_at >= ? AND email_id IN ({placeholders})",
+                    [mailbox_key, version, oldest, *chunk]
+                )
+                for email_id, insight in rows:
+                    found[email_id] = orjson.loads(insight)
+
+        return found
+
+    def put_many(self, mailbox: str, version: str, insights: List[Dict]):
+        """Store insights under the mailbox and their email_id, dropping expired rows"""
+        mailbox_key = self._mailbox_key(mailbox)
+        now = time.time()
+        rows = [
+            (mailbox_key, insight["email_id"], version, orjson.dumps(insight), now)
+            for insight in insights
+            if insight.get("email_id")
+        ]
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM email_insights WHERE created_at < ?", (now - self._ttl,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO email_insights (mailbox, email_id, version, insight, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
@@ -1,38 +1,158 @@
 import google.generativeai as genai
-import json
+from google.api_core.exceptions import TooManyRequests
+import hashlib
+import orjson
 import re
-from typing import Dict, List, Optional
+import threading
+import time
+import re2
+from typing import Dict, List, Optional, Tuple
+# pydantic, which turns response schemas into JSON schema, rejects typing.TypedDict before 3.12
+from typing_extensions import TypedDict
 from datetime import datetime
 import os
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
-class IntelligentExtractor:
-    def __init__(self):
-        api_key = os.getenv('GEMINI_API_KEY')
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')  # Fixed model name
-        else:
-            self.model = None
-            print("Warning: GEMINI_API_KEY not found. Using rule-based extraction only.")
-    
-    def extract_financial_insights(self, email_content: str, email_from: str, subject: str) -> Dict:
-        """Extract comprehensive financial insights using Gemini AI"""
-        
-        if not self.model:
-            return self._fallback_extraction(email_content, email_from, subject)
-        
-        prompt = f"""
-Analyze this email for CREDIT CARD SPECIFIC financial insights. Focus ONLY on credit card transactions, statements, and card-related information.
+# Amount patterns scan the whole body, so they run on RE2 (linear time; see
+# transaction_extractor). RE2's \s is ASCII-only, which is all a parsed body has.
+IGNORECASE = re2.Options()
+IGNORECASE.case_sensitive = False
+AMOUNT_PATTERNS = [
+    re2.compile(r'(?:₹|inr|rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)', IGNORECASE),
+    re2.compile(r'([0-9,]+(?:\.[0-9]{2})?)\s*(?:₹|inr|rs\.?)', IGNORECASE),
+    re2.compile(r'(?:amount|total|paid|charged).*?(?:₹|inr|rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)', IGNORECASE),
+]
+
+# Any of these marks an email as card related in rule-based extraction
+# ('credit card' is already covered by 'card')
+CREDIT_CARD_KEYWORDS = ('card', 'transaction', 'charged', 'statement', 'payment', 'purchase', 'bill')
+
+# Known merchants: lowercase pattern -> display name
+KNOWN_MERCHANTS = {
+    'swiggy': 'Swiggy',
+    'zomato': 'Zomato',
+    'amazon': 'Amazon',
+    'flipkart': 'Flipkart',
+    'uber': 'Uber',
+    'ola': 'Ola',
+    'paytm': 'Paytm',
+    'phonepe': 'PhonePe',
+    'gpay': 'Google Pay',
+    'myntra': 'Myntra',
+    'bigbasket': 'BigBasket',
+    'netflix': 'Netflix',
+    'spotify': 'Spotify',
+    'airtel': 'Airtel',
+    'jio': 'Jio',
+    'hdfc': 'HDFC Bank',
+    'icici': 'ICICI Bank',
+    'sbi': 'SBI',
+    'axis': 'Axis Bank'
+}
+# Capitalized subject words that are never a merchant name
+MERCHANT_NOISE_WORDS = frozenset({'you', 'your', 'rs', 'view', 'fwd', 'account', 'alert', 'update', 'payment', 'scheduled'})
+
+MERCHANT_CATEGORIES = {
+    'Food': ['swiggy', 'zomato', 'dominos', 'kfc', 'mcdonald'],
+    'Shopping': ['amazon', 'flipkart', 'myntra', 'ajio'],
+    'Transportation': ['uber', 'ola', 'rapido'],
+    'Entertainment': ['netflix', 'spotify', 'hotstar', 'prime'],
+    'Bills': ['airtel', 'jio', 'bsnl', 'electricity', 'gas'],
+    'Healthcare': ['practo', 'apollo', 'pharmeasy'],
+    'Travel': ['makemytrip', 'goibibo', 'cleartrip', 'irctc']
+}
+# Reverse index, merchant -> category, in the same order as MERCHANT_CATEGORIES
+MERCHANT_TO_CATEGORY = {
+    merchant: category
+    for category, merchants in MERCHANT_CATEGORIES.items()
+    for merchant in merchants
+}
+
+SENDER_DOMAIN_RE = re.compile(r'@([^.]+)')
+CAPITALIZED_WORD_RE = re.compile(r'\b[A-Z][a-z]+\b')
+
+# Card signals (amount, merchant, last four digits) sit near the top of an email and
+# the tail is mostly footer and tracking text, so bodies are clipped before any
+# lowercasing, regex or prompt; batch prompts carry many emails and clip harder
+EMAIL_BODY_CHARS = 4096
+BATCH_PROMPT_BODY_CHARS = 500
+
+# Gemini responses kept for repeated (sender, subject, body) content, e.g. a retried
+# email or identical template mails; oldest entries evicted first
+RESPONSE_CACHE_MAXSIZE = 4096
+
+# Pause before retrying a rate-limited batch one email at a time, so the
+# retries don't add to the load the API just refused
+RATE_LIMIT_BACKOFF_SECONDS = 5
 
-Email From: {email_from}
-Subject: {subject}
-Content: {email_content}
+# Response schemas for Gemini's structured output, mirroring the format in
+# SYSTEM_INSTRUCTION: the model can then only return JSON of this shape
+class TransactionInsight(TypedDict):
+    merchant: Optional[str]
+    amount: Optional[float]
+    currency: Optional[str]
+    date: Optional[str]
+    category: Optional[str]
+    transaction_type: Optional[str]
+    card_type: Optional[str]
+    card_last_four: Optional[str]
+    confidence: Optional[float]
 
-Extract and return ONLY valid JSON (no markdown, no explanation):
-{{
-  "transaction": {{
+class SubscriptionInsight(TypedDict):
+    service: Optional[str]
+    amount: Optional[float]
+    billing_cycle: Optional[str]
+    next_billing: Optional[str]
+    charged_to_card: Optional[bool]
+
+class TravelInsight(TypedDict):
+    airline: Optional[str]
+    hotel: Optional[str]
+    destination: Optional[str]
+    travel_date: Optional[str]
+    booking_amount: Optional[float]
+    charged_to_card: Optional[bool]
+
+class BillsInsight(TypedDict):
+    utility_type: Optional[str]
+    provider: Optional[str]
+    amount: Optional[float]
+    due_date: Optional[str]
+    charged_to_card: Optional[bool]
+
+class CardInfoInsight(TypedDict):
+    card_statement: Optional[bool]
+    statement_period: Optional[str]
+    total_amount_due: Optional[float]
+    minimum_due: Optional[float]
+    due_date: Optional[str]
+    available_limit: Optional[float]
+    rewards_earned: Optional[float]
+    cashback_earned: Optional[float]
+
+class EmailInsights(TypedDict):
+    transaction: Optional[TransactionInsight]
+    subscription: Optional[SubscriptionInsight]
+    travel: Optional[TravelInsight]
+    bills: Optional[BillsInsight]
+    card_info: Optional[CardInfoInsight]
+    is_relevant: bool
+
+class BatchEmailInsights(EmailInsights):
+    email_index: int
+
+EMAIL_RESPONSE_CONFIG = {'response_mime_type': 'application/json', 'response_schema': EmailInsights}
+BATCH_RESPONSE_CONFIG = {'response_mime_type': 'application/json', 'response_schema': list[BatchEmailInsights]}
+
+# Static part of every extraction prompt, sent once per request as the model's
+# system instruction so each prompt carries only the email(s) themselves
+SYSTEM_INSTRUCTION = """
+Analyze emails for CREDIT CARD SPECIFIC financial insights. Focus ONLY on credit card transactions, statements, and card-related information.
+
+For each email, extract a JSON object in this exact format:
+{
+  "transaction": {
     "merchant": "actual merchant name charged to credit card (null if not a card transaction)",
     "amount": numeric_amount_only,
     "currency": "INR/USD/etc",
@@ -42,30 +162,30 @@ Extract and return ONLY valid JSON (no markdown, no explanation):
     "card_type": "credit_card/debit_card/null",
     "card_last_four": "last 4 digits if available or null",
     "confidence": 0.0-1.0
-  }},
-  "subscription": {{
+  },
+  "subscription": {
     "service": "subscription service charged to credit card",
     "amount": numeric_amount,
     "billing_cycle": "monthly/yearly/weekly", 
     "next_billing": "YYYY-MM-DD",
     "charged_to_card": true/false
-  }},
-  "travel": {{
+  },
+  "travel": {
     "airline": "airline name (if charged to card)",
     "hotel": "hotel chain name (if charged to card)", 
     "destination": "city/country",
     "travel_date": "YYYY-MM-DD",
     "booking_amount": numeric_amount,
     "charged_to_card": true/false
-  }},
-  "bills": {{
+  },
+  "bills": {
     "utility_type": "electricity/gas/internet/mobile/insurance (if charged to card)",
     "provider": "company name",
     "amount": numeric_amount,
     "due_date": "YYYY-MM-DD",
     "charged_to_card": true/false
-  }},
-  "card_info": {{
+  },
+  "card_info": {
     "card_statement": true/false,
     "statement_period": "YYYY-MM to YYYY-MM",
     "total_amount_due": numeric_amount,
@@ -74,9 +194,11 @@ Extract and return ONLY valid JSON (no markdown, no explanation):
     "available_limit": numeric_amount,
     "rewards_earned": numeric_amount,
     "cashback_earned": numeric_amount
-  }},
+  },
   "is_relevant": true/false
-}}
+}
+
+A request may hold several emails, numbered "Email 1", "Email 2" and so on: return a JSON array with one such object per email, in order, each with an added "email_index" (1 for Email 1, and so on).
 
 FOCUS RULES:
 - ONLY extract if it's related to CREDIT CARD usage, statements, or payments
@@ -86,22 +208,74 @@ FOCUS RULES:
 - Extract card-specific information like last 4 digits, card statements, rewards
 """
 
+GEMINI_MODEL = 'gemini-1.5-flash'
+
+# Identifies what AI extraction output looks like: it changes with the model or
+# with SYSTEM_INSTRUCTION, which holds the output format and rules, so insights
+# stored under an older version aren't reused (bump the suffix for other changes)
+EXTRACTION_VERSION = hashlib.blake2b(
+    f"{GEMINI_MODEL}\n{SYSTEM_INSTRUCTION}\n1".encode(), digest_size=8
+).hexdigest()
+
+class IntelligentExtractor:
+    def __init__(self):
+        api_key = os.getenv('GEMINI_API_KEY')
+        if api_key:
+            genai.configure(api_key=api_key)
+            self.model = genai.GenerativeModel(
+                GEMINI_MODEL,
+                system_instruction=SYSTEM_INSTRUCTION
+            )
+            # (from, subject, body digest) -> response JSON text; decoded afresh on every
+            # hit so callers can't mutate a cached result
+            self._response_cache = {}
+            self._response_cache_lock = threading.Lock()
+        else:
+            self.model = None
+            print("Warning: GEMINI_API_KEY not found. Using rule-based extraction only.")
+    
+    @property
+    def is_cpu_bound(self) -> bool:
+        """Rule-based extraction is local regex work; with a model it is mostly HTTP waits"""
+        return self.model is None
+    
+    def extract_financial_insights(self, email_content: str, email_from: str, subject: str) -> Dict:
+        """Extract comprehensive financial insights using Gemini AI"""
+        return self._extract_with_source(email_content, email_from, subject)[0]
+    
+    def _extract_with_source(self, email_content: str, email_from: str, subject: str) -> Tuple[Dict, bool]:
+        """Extract insights for one email, and whether Gemini (not the rule-based fallback) produced them"""
+        email_content = email_content[:EMAIL_BODY_CHARS]
+        
+        if not self.model:
+            return self._fallback_extraction(email_content, email_from, subject), False
+        
+        # Only parsed responses are cached; a failed call falls back uncached so the
+        # same content gets another AI attempt next time
+        key = (email_from, subject, hashlib.blake2b(email_content.encode(), digest_size=16).digest())
+        response_text = self._response_cache.get(key)
+        if response_text is not None:
+            return orjson.loads(response_text), True
+        
+        prompt = f"From: {email_from}\nSubject: {subject}\nContent: {email_content}"
+
         try:
-            response = self.model.generate_content(prompt)
-            # Clean response to extract JSON
-            response_text = response.text.strip()
-            
-            # Remove markdown formatting if present
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            
-            return json.loads(response_text)
+            # Structured output: bare JSON matching the schema, never fenced markdown
+            response = self.model.generate_content(prompt, generation_config=EMAIL_RESPONSE_CONFIG)
+            result = orjson.loads(response.text)
+            self._cache_response(key, response.text)
+            return result, True
             
         except Exception as e:
             print(f"Gemini extraction failed: {e}")
-            return self._fallback_extraction(email_content, email_from, subject)
+            return self._fallback_extraction(email_content, email_from, subject), False
+    
+    def _cache_response(self, key, response_text: str):
+        """Remember a parsed Gemini response, evicting the oldest past the size cap"""
+        with self._response_cache_lock:
+            if len(self._response_cache) >= RESPONSE_CACHE_MAXSIZE:
+                del self._response_cache[next(iter(self._response_cache))]
+            self._response_cache[key] = response_text
     
     def _fallback_extraction(self, email_content: str, email_from: str, subject: str) -> Dict:
         """Fallback rule-based extraction when AI is not available - CREDIT CARD FOCUSED"""
@@ -120,9 +294,8 @@ FOCUS RULES:
         
         text = f"{subject} {email_content}".lower()
         
-        # Check if it's a CREDIT CARD email - Updated keywords
-        credit_card_keywords = ['card', 'credit card', 'transaction', 'charged', 'statement', 'payment', 'purchase', 'bill']
-        if not any(keyword in text for keyword in credit_card_keywords):
+        # Check if it's a CREDIT CARD email
+        if not any(keyword in text for keyword in CREDIT_CARD_KEYWORDS):
             return result
         
         result["is_relevant"] = True
@@ -149,68 +322,39 @@ FOCUS RULES:
     def _extract_clean_merchant(self, email_from: str, subject: str) -> Optional[str]:
         """Extract clean merchant name, filtering out noise"""
         
-        # Known merchants mapping
-        merchant_patterns = {
-            'swiggy': 'Swiggy',
-            'zomato': 'Zomato',
-            'amazon': 'Amazon',
-            'flipkart': 'Flipkart',
-            'uber': 'Uber',
-            'ola': 'Ola',
-            'paytm': 'Paytm',
-            'phonepe': 'PhonePe',
-            'gpay': 'Google Pay',
-            'myntra': 'Myntra',
-            'bigbasket': 'BigBasket',
-            'netflix': 'Netflix',
-            'spotify': 'Spotify',
-            'airtel': 'Airtel',
-            'jio': 'Jio',
-            'hdfc': 'HDFC Bank',
-            'icici': 'ICICI Bank',
-            'sbi': 'SBI',
-            'axis': 'Axis Bank'
-        }
-        
         text = f"{email_from} {subject}".lower()
         
         # Check known merchants first
-        for pattern, name in merchant_patterns.items():
+        for pattern, name in KNOWN_MERCHANTS.items():
             if pattern in text:
                 return name
         
         # Extract from domain
-        domain_match = re.search(r'@([^.]+)', email_from)
+        domain_match = SENDER_DOMAIN_RE.search(email_from)
         if domain_match:
             domain = domain_match.group(1).lower()
-            for pattern, name in merchant_patterns.items():
+            for pattern, name in KNOWN_MERCHANTS.items():
                 if pattern in domain:
                     return name
         
-        # Avoid noise words
-        noise_words = {'you', 'your', 'rs', 'view', 'fwd', 'account', 'alert', 'update', 'payment', 'scheduled'}
-        
-        # Extract merchant from subject
-        words = re.findall(r'\b[A-Z][a-z]+\b', subject)
-        for word in words:
-            if word.lower() not in noise_words and len(word) > 2:
+        # Extract merchant from subject, avoiding noise words; words are matched
+        # lazily so the scan stops at the first usable one
+        for match in CAPITALIZED_WORD_RE.finditer(subject):
+            word = match.group()
+            if word.lower() not in MERCHANT_NOISE_WORDS and len(word) > 2:
                 return word
         
         return None
     
     def _extract_amount(self, text: str) -> Optional[float]:
         """Extract amount from text"""
-        patterns = [
-            r'(?:₹|inr|rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)',
-            r'([0-9,]+(?:\.[0-9]{2})?)\s*(?:₹|inr|rs\.?)',
-            r'(?:amount|total|paid|charged).*?(?:₹|inr|rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
+        # Only the first hit per pattern is used, so stop scanning there
+        # instead of collecting every match in the body
+        for pattern in AMOUNT_PATTERNS:
+            match = pattern.search(text)
+            if match:
                 try:
-                    amount = float(matches[0].replace(',', ''))
+                    amount = float(match.group(1).replace(',', ''))
                     if 1 <= amount <= 1000000:  # Reasonable range
                         return amount
                 except ValueError:
@@ -220,25 +364,30 @@ FOCUS RULES:
     
     def _categorize_merchant(self, merchant: str) -> str:
         """Categorize merchant"""
-        categories = {
-            'Food': ['swiggy', 'zomato', 'dominos', 'kfc', 'mcdonald'],
-            'Shopping': ['amazon', 'flipkart', 'myntra', 'ajio'],
-            'Transportation': ['uber', 'ola', 'rapido'],
-            'Entertainment': ['netflix', 'spotify', 'hotstar', 'prime'],
-            'Bills': ['airtel', 'jio', 'bsnl', 'electricity', 'gas'],
-            'Healthcare': ['practo', 'apollo', 'pharmeasy'],
-            'Travel': ['makemytrip', 'goibibo', 'cleartrip', 'irctc']
-        }
-        
         merchant_lower = merchant.lower()
-        for category, merchants in categories.items():
-            if any(m in merchant_lower for m in merchants):
+        category = MERCHANT_TO_CATEGORY.get(merchant_lower)
+        if category:
+            return category
+        
+        # Names like "Dominos Pizza" or "Uber Eats" only contain a known merchant.
+        # No known merchant contains an earlier one, so an exact hit above is also
+        # the first substring hit here.
+        for known, category in MERCHANT_TO_CATEGORY.items():
+            if known in merchant_lower:
                 return category
         
         return 'Other'
     
     def extract_insights_batch(self, emails: List[Dict], batch_size: int = 5) -> List[Dict]:
         """Process multiple emails in batches for better performance"""
+        return [result for result, _ in self.extract_insights_batch_with_sources(emails, batch_size)]
+    
+    def extract_insights_batch_with_sources(self, emails: List[Dict], batch_size: int = 5) -> List[Tuple[Dict, bool]]:
+        """extract_insights_batch, pairing each result with whether Gemini produced it.
+        
+        A rate limit, an outage or a short batch response leaves rule-based
+        results in an AI-backed run; only Gemini's are worth persisting.
+        """
         
         if not emails:
             return []
@@ -257,80 +406,51 @@ FOCUS RULES:
                 except Exception as e:
                     print(f"Batch AI processing failed: {e}")
                     # Fallback to individual processing
-                    for email in batch:
-                        result = self.extract_financial_insights(
-                            email.get('bodyText', ''),
-                            email.get('from', ''),
-                            email.get('subject', '')
-                        )
-                        result['email_id'] = email.get('id')
-                        results.append(result)
+                    results.extend(self._extract_individually(batch))
             else:
                 # Use rule-based extraction for batch
-                for email in batch:
-                    result = self.extract_financial_insights(
-                        email.get('bodyText', ''),
-                        email.get('from', ''),
-                        email.get('subject', '')
-                    )
-                    result['email_id'] = email.get('id')
-                    results.append(result)
+                results.extend(self._extract_individually(batch))
         
         return results
     
-    def _process_batch_with_ai(self, emails: List[Dict]) -> List[Dict]:
+    def _extract_individually(self, emails: List[Dict]) -> List[Tuple[Dict, bool]]:
+        """Extract emails one call each, in order.
+        
+        With a model this is the retry path for a failed batch, which is often a
+        rate limit, so the calls go one at a time rather than concurrently.
+        """
+        def extract(email: Dict) -> Tuple[Dict, bool]:
+            result, from_ai = self._extract_with_source(
+                email.get('bodyText', ''),
+                email.get('from', ''),
+                email.get('subject', '')
+            )
+            result['email_id'] = email.get('id')
+            return result, from_ai
+        
+        return [extract(email) for email in emails]
+    
+    def _process_batch_with_ai(self, emails: List[Dict]) -> List[Tuple[Dict, bool]]:
         """Process multiple emails in a single AI call"""
         
         if not self.model or not emails:
             return []
         
-        # Format emails for batch processing
+        # Format emails for batch processing; how to answer is in SYSTEM_INSTRUCTION
         email_texts = []
         for i, email in enumerate(emails):
-            email_text = f"""
-Email {i+1}:
+            email_text = f"""Email {i+1}:
 From: {email.get('from', '')}
 Subject: {email.get('subject', '')}
-Content: {email.get('bodyText', '')[:500]}
----
-"""
+Content: {email.get('bodyText', '')[:BATCH_PROMPT_BODY_CHARS]}
+---"""
             email_texts.append(email_text)
         
-        batch_prompt = f"""
-Analyze these {len(emails)} emails for CREDIT CARD SPECIFIC insights. Focus ONLY on credit card transactions, statements, and card-related information.
-
-{chr(10).join(email_texts)}
-
-Return ONLY a JSON array with {len(emails)} objects in this exact format:
-[
-  {{
-    "email_index": 1,
-    "transaction": {{"merchant": "name or null", "amount": number_or_null, "currency": "INR", "date": "YYYY-MM-DD", "category": "Food/Shopping/etc", "transaction_type": "expense", "card_type": "credit_card/debit_card/null", "card_last_four": "digits or null", "confidence": 0.8}},
-    "subscription": {{"service": "name or null", "amount": number_or_null, "billing_cycle": "monthly", "next_billing": "YYYY-MM-DD", "charged_to_card": true_or_false}},
-    "travel": {{"airline": "name or null", "hotel": "name or null", "destination": "city", "travel_date": "YYYY-MM-DD", "booking_amount": number_or_null, "charged_to_card": true_or_false}},
-    "bills": {{"utility_type": "type or null", "provider": "name or null", "amount": number_or_null, "due_date": "YYYY-MM-DD", "charged_to_card": true_or_false}},
-    "card_info": {{"card_statement": true_or_false, "statement_period": "YYYY-MM to YYYY-MM", "total_amount_due": number_or_null, "minimum_due": number_or_null, "due_date": "YYYY-MM-DD", "available_limit": number_or_null, "rewards_earned": number_or_null, "cashback_earned": number_or_null}},
-    "is_relevant": true_or_false
-  }}
-]
-
-FOCUS RULES:
-- ONLY extract if related to CREDIT CARD usage, statements, or payments
-- Set is_relevant to false for non-credit card financial activities
-- Prioritize card transaction data over other categories
-"""
+        batch_prompt = '\n'.join(email_texts)
         
         try:
-            response = self.model.generate_content(batch_prompt)
-            response_text = response.text.strip()
-            
-            # Clean response
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            
-            batch_results = json.loads(response_text)
+            response = self.model.generate_content(batch_prompt, generation_config=BATCH_RESPONSE_CONFIG)
+            batch_results = orjson.loads(response.text)
             
             # Map results back to emails
             final_results = []
@@ -338,7 +458,7 @@ FOCUS RULES:
                 if i < len(batch_results):
                     result = batch_results[i]
                     result['email_id'] = email.get('id')
-                    final_results.append(result)
+                    final_results.append((result, True))
                 else:
                     # Fallback if batch result is missing
                     result = self._fallback_extraction(
@@ -347,20 +467,24 @@ FOCUS RULES:
                         email.get('subject', '')
                     )
                     result['email_id'] = email.get('id')
-                    final_results.append(result)
+                    final_results.append((result, False))
             
             return final_results
             
         except Exception as e:
             print(f"Batch AI processing error: {e}")
+            if isinstance(e, TooManyRequests):
+                time.sleep(RATE_LIMIT_BACKOFF_SECONDS)
             # Fallback to individual processing
-            results = []
-            for email in emails:
-                result = self.extract_financial_insights(
-                    email.get('bodyText', ''),
-                    email.get('from', ''),
-                    email.get('subject', '')
-                )
-                result['email_id'] = email.get('id')
-                results.append(result)
-            return results
\ No newline at end of file
+            return self._extract_individually(emails)
+
+
+# One extractor per worker process, built on first use
+_worker_extractor = None
+
+def extract_insights_batch_in_worker(emails: List[Dict]) -> List[Tuple[Dict, bool]]:
+    """Extract a batch with this process's extractor; module-level so process pools can pickle it"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = IntelligentExtractor()
+    return _worker_extractor.extract_insights_batch_with_sources(emails, batch_size=len(emails))
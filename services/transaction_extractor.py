@@ -1,83 +1,113 @@
+import calendar
 import re
+import re2
 from datetime import datetime
 from typing import List, Dict, Optional
 
+# Transaction details sit near the top of an email; the tail is mostly footer and
+# tracking text, so bodies are clipped to this many characters before extraction
+EMAIL_BODY_CHARS = 4096
+
+# Common merchants and the lowercase names they appear under, in priority order.
+# Plain substring checks on lowercased text: CPython's re has no DFA, so even a
+# single alternation of these literals is slower than str's C-level search.
+MERCHANT_KEYWORDS = {
+    'swiggy': ('swiggy',),
+    'zomato': ('zomato',),
+    'amazon': ('amazon',),
+    'flipkart': ('flipkart',),
+    'paytm': ('paytm',),
+    'uber': ('uber',),
+    'ola': ('ola',),
+    'myntra': ('myntra',),
+    'bigbasket': ('bigbasket',),
+    'phonepe': ('phonepe',),
+    'gpay': ('google pay', 'gpay'),
+}
+
+# Patterns that scan whole email bodies run on RE2, which matches in linear
+# time: with stdlib re the lazy "amount.*?₹" pattern goes quadratic on a long
+# body without such an amount (parsed bodies are a single line). RE2's \s and
+# \d are ASCII-only; EmailParser already collapses body whitespace to spaces.
+IGNORECASE = re2.Options()
+IGNORECASE.case_sensitive = False
+
+# Amount patterns - support multiple currencies
+AMOUNT_PATTERNS = [
+    re2.compile(r'(?:₹|INR|Rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)', IGNORECASE),  # Indian Rupee
+    re2.compile(r'(?:\$|USD)\s*([0-9,]+(?:\.[0-9]{2})?)', IGNORECASE),       # US Dollar
+    re2.compile(r'(?:€|EUR)\s*([0-9,]+(?:\.[0-9]{2})?)', IGNORECASE),        # Euro
+    re2.compile(r'([0-9,]+(?:\.[0-9]{2})?)\s*(?:₹|INR|Rs\.?)', IGNORECASE),  # Amount before currency
+    re2.compile(r'(?:amount|total|paid|charged).*?(?:₹|INR|Rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)', IGNORECASE),
+    re2.compile(r'(?:₹|INR|Rs\.?)\s*([0-9,]+)', IGNORECASE),  # Without decimal
+]
+
+# What the amount patterns can match in lowercased text without IGNORECASE: only
+# the currency symbols survive lowercasing, so a symbol next to a digit
+SYMBOL_AMOUNT_RE = re2.compile(r'[₹$€]\s*[0-9,]|[0-9,]\s*₹')
+
+# Date patterns, capturing the pieces _parse_date_match builds the date from
+DATE_PATTERNS = [
+    re2.compile(r'(\d{1,2})([-/])(\d{1,2})([-/])(\d{2,4})'),  # DD/MM/YYYY or MM/DD/YYYY
+    re2.compile(r'(\d{2,4})([-/])(\d{1,2})([-/])(\d{1,2})'),  # YYYY/MM/DD
+    re2.compile(r'(\d{1,2})\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+(\d{2,4})'),  # DD MMM YYYY
+    re2.compile(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+(\d{1,2})(,?)\s+(\d{2,4})'),  # MMM DD, YYYY
+]
+MONTH_NUMBERS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+# Transaction keywords to filter relevant emails
+TRANSACTION_KEYWORDS = (
+    'order', 'payment', 'invoice', 'receipt', 'transaction', 'purchase',
+    'charged', 'paid', 'booking', 'confirmation', 'bill', 'checkout'
+)
+
+# Category mapping
+CATEGORY_MAPPING = {
+    'swiggy': 'Food',
+    'zomato': 'Food',
+    'amazon': 'Shopping',
+    'flipkart': 'Shopping',
+    'myntra': 'Shopping',
+    'bigbasket': 'Groceries',
+    'uber': 'Transportation',
+    'ola': 'Transportation',
+    'paytm': 'Digital Wallet',
+    'phonepe': 'Digital Wallet',
+    'gpay': 'Digital Wallet',
+}
+
+SENDER_DOMAIN_RE = re.compile(r'@([^.]+)')
+CAPITALIZED_WORD_RE = re.compile(r'\b[A-Z][a-z]+\b')
+
 class TransactionExtractor:
-    def __init__(self):
-        # Common merchant patterns
-        self.merchant_patterns = {
-            'swiggy': r'(?i)swiggy',
-            'zomato': r'(?i)zomato', 
-            'amazon': r'(?i)amazon',
-            'flipkart': r'(?i)flipkart',
-            'paytm': r'(?i)paytm',
-            'uber': r'(?i)uber',
-            'ola': r'(?i)ola',
-            'myntra': r'(?i)myntra',
-            'bigbasket': r'(?i)bigbasket',
-            'phonepe': r'(?i)phonepe',
-            'gpay': r'(?i)google pay|gpay',
-        }
-        
-        # Amount patterns - support multiple currencies
-        self.amount_patterns = [
-            r'(?:₹|INR|Rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)',  # Indian Rupee
-            r'(?:\$|USD)\s*([0-9,]+(?:\.[0-9]{2})?)',       # US Dollar
-            r'(?:€|EUR)\s*([0-9,]+(?:\.[0-9]{2})?)',        # Euro
-            r'([0-9,]+(?:\.[0-9]{2})?)\s*(?:₹|INR|Rs\.?)',  # Amount before currency
-            r'(?:amount|total|paid|charged).*?(?:₹|INR|Rs\.?)\s*([0-9,]+(?:\.[0-9]{2})?)',
-            r'(?:₹|INR|Rs\.?)\s*([0-9,]+)',  # Without decimal
-        ]
-        
-        # Date patterns
-        self.date_patterns = [
-            r'(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',  # DD/MM/YYYY or MM/DD/YYYY
-            r'(\d{2,4}[-/]\d{1,2}[-/]\d{1,2})',  # YYYY/MM/DD
-            r'(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{2,4})',  # DD MMM YYYY
-            r'((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+\d{1,2},?\s+\d{2,4})',  # MMM DD, YYYY
-        ]
-        
-        # Transaction keywords to filter relevant emails
-        self.transaction_keywords = [
-            'order', 'payment', 'invoice', 'receipt', 'transaction', 'purchase',
-            'charged', 'paid', 'booking', 'confirmation', 'bill', 'checkout'
-        ]
-        
-        # Category mapping
-        self.category_mapping = {
-            'swiggy': 'Food',
-            'zomato': 'Food',
-            'amazon': 'Shopping',
-            'flipkart': 'Shopping',
-            'myntra': 'Shopping',
-            'bigbasket': 'Groceries',
-            'uber': 'Transportation',
-            'ola': 'Transportation',
-            'paytm': 'Digital Wallet',
-            'phonepe': 'Digital Wallet',
-            'gpay': 'Digital Wallet',
-        }
-    
     def extract_transactions(self, parsed_email: Dict) -> List[Dict]:
         """Extract transaction data from parsed email"""
         transactions = []
         
+        # Subject + body, joined and lowercased once and shared by every step below
+        subject = parsed_email.get('subject', '')
+        text = subject + ' ' + parsed_email.get('bodyText', '')[:EMAIL_BODY_CHARS]
+        text_lc = text.lower()
+        
         # Check if email is transaction-related
-        if not self._is_transaction_email(parsed_email):
+        if not self._is_transaction_email(subject.lower(), text_lc):
             return transactions
         
         # Extract merchant
-        merchant = self._extract_merchant(parsed_email)
+        merchant = self._extract_merchant(parsed_email, text_lc)
         if not merchant:
             return transactions
         
         # Extract amount
-        amount = self._extract_amount(parsed_email)
+        amount = self._extract_amount(text)
         if not amount:
             return transactions
         
         # Extract date (fallback to email date)
-        date = self._extract_date(parsed_email)
+        date = self._extract_date(parsed_email, text)
         
         # Get category
         category = self._get_category(merchant)
@@ -94,85 +124,75 @@ class TransactionExtractor:
         transactions.append(transaction)
         return transactions
     
-    def _is_transaction_email(self, email: Dict) -> bool:
-        """Check if email contains transaction-related content"""
-        text = (email.get('subject', '') + ' ' + email.get('bodyText', '')).lower()
-        
-        # Check for transaction keywords
-        for keyword in self.transaction_keywords:
-            if keyword in text:
+    def _is_transaction_email(self, subject_lc: str, text_lc: str) -> bool:
+        """Check if email contains transaction-related content, given the lowercased
+        subject and subject + body"""
+        # Check for transaction keywords, in the (short) subject first
+        for keyword in TRANSACTION_KEYWORDS:
+            if keyword in subject_lc:
                 return True
-        
-        # Check for amount patterns
-        for pattern in self.amount_patterns:
-            if re.search(pattern, text):
+        for keyword in TRANSACTION_KEYWORDS:
+            if keyword in text_lc:
                 return True
         
-        return False
+        # Check for amount patterns
+        return SYMBOL_AMOUNT_RE.search(text_lc) is not None
     
-    def _extract_merchant(self, email: Dict) -> Optional[str]:
-        """Extract merchant name from email"""
-        text = email.get('subject', '') + ' ' + email.get('bodyText', '') + ' ' + email.get('from', '')
+    def _extract_merchant(self, email: Dict, text_lc: str) -> Optional[str]:
+        """Extract merchant name from email, given its lowercased subject + body"""
+        from_email = email.get('from', '')
+        from_lc = from_email.lower()
         
         # Check against known merchant patterns
-        for merchant, pattern in self.merchant_patterns.items():
-            if re.search(pattern, text):
-                return merchant.title()
+        for merchant, keywords in MERCHANT_KEYWORDS.items():
+            for keyword in keywords:
+                if keyword in text_lc or keyword in from_lc:
+                    return merchant.title()
         
         # Extract from email sender domain
-        from_email = email.get('from', '')
-        domain_match = re.search(r'@([^.]+)', from_email)
+        domain_match = SENDER_DOMAIN_RE.search(from_email)
         if domain_match:
             domain = domain_match.group(1).lower()
             # Check if domain matches known merchants
-            for merchant in self.merchant_patterns.keys():
+            for merchant in MERCHANT_KEYWORDS:
                 if merchant in domain:
                     return merchant.title()
         
         # Fallback: extract from subject line
         subject = email.get('subject', '')
-        words = re.findall(r'\b[A-Z][a-z]+\b', subject)
-        if words:
-            return words[0]
+        word_match = CAPITALIZED_WORD_RE.search(subject)
+        if word_match:
+            return word_match.group()
         
         return None
     
-    def _extract_amount(self, email: Dict) -> Optional[float]:
-        """Extract transaction amount from email"""
-        text = email.get('subject', '') + ' ' + email.get('bodyText', '')
-        
-        for pattern in self.amount_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                for match in matches:
-                    try:
-                        # Clean amount string
-                        amount_str = match.replace(',', '')
-                        amount = float(amount_str)
-                        # Filter out unreasonable amounts
-                        if 1 <= amount <= 1000000:  # Between ₹1 and ₹10L
-                            return amount
-                    except ValueError:
-                        continue
+    def _extract_amount(self, text: str) -> Optional[float]:
+        """Extract transaction amount from the email's subject + body"""
+        # Matches are taken lazily: the first one in range wins, so the rest of
+        # the body is never scanned or converted
+        for pattern in AMOUNT_PATTERNS:
+            for match in pattern.finditer(text):
+                try:
+                    # Clean amount string
+                    amount_str = match.group(1).replace(',', '')
+                    amount = float(amount_str)
+                    # Filter out unreasonable amounts
+                    if 1 <= amount <= 1000000:  # Between ₹1 and ₹10L
+                        return amount
+                except ValueError:
+                    continue
         
         return None
     
-    def _extract_date(self, email: Dict) -> str:
-        """Extract transaction date from email"""
-        text = email.get('subject', '') + ' ' + email.get('bodyText', '')
-        
-        # Try to find date in email content
-        for pattern in self.date_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                try:
-                    # Parse and format date
-                    date_str = matches[0]
-                    parsed_date = self._parse_date(date_str)
-                    if parsed_date:
-                        return parsed_date.strftime('%Y-%m-%d')
-                except:
-                    continue
+    def _extract_date(self, email: Dict, text: str) -> str:
+        """Extract transaction date from the email's subject + body"""
+        # Try to find date in email content (the first match of each pattern)
+        for index, pattern in enumerate(DATE_PATTERNS):
+            match = pattern.search(text)
+            if match:
+                parsed_date = self._parse_date_match(index, match.groups())
+                if parsed_date:
+                    return parsed_date.strftime('%Y-%m-%d')
         
         # Fallback to email internal date
         internal_date = email.get('internalDate', '')
@@ -188,34 +208,55 @@ class TransactionExtractor:
         # Final fallback to current date
         return datetime.now().strftime('%Y-%m-%d')
     
-    def _parse_date(self, date_str: str) -> Optional[datetime]:
-        """Parse date string to datetime object"""
-        date_formats = [
-            '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d',
-            '%d-%m-%Y', '%m-%d-%Y', '%Y-%m-%d',
-            '%d %b %Y', '%d %B %Y',
-            '%b %d, %Y', '%B %d, %Y'
-        ]
-        
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
+    def _parse_date_match(self, index: int, groups: tuple) -> Optional[datetime]:
+        """Build the date matched by DATE_PATTERNS[index], or None if it isn't one.
+        
+        Accepts what trying '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d' (and the '-'
+        forms), '%d %b %Y' and '%b %d, %Y' with strptime in turn did: one
+        separator throughout, four-digit years, day before month when both fit,
+        and a comma after the day in "Mar 3, 2024". The pattern already says
+        which layout it is, so there is no trying and failing per format.
+        """
+        if index == 0:
+            first, separator, second, other_separator, year = groups
+            if separator != other_separator or len(year) != 4:
+                return None
+            return (self._calendar_date(int(year), int(second), int(first))
+                    or self._calendar_date(int(year), int(first), int(second)))
+        if index == 1:
+            year, separator, month, other_separator, day = groups
+            if separator != other_separator or len(year) != 4:
+                return None
+            return self._calendar_date(int(year), int(month), int(day))
+        if index == 2:
+            day, month, year = groups
+            if len(year) != 4:
+                return None
+            return self._calendar_date(int(year), MONTH_NUMBERS[month], int(day))
         
+        month, day, comma, year = groups
+        if not comma or len(year) != 4:
+            return None
+        return self._calendar_date(int(year), MONTH_NUMBERS[month], int(day))
+    
+    @staticmethod
+    def _calendar_date(year: int, month: int, day: int) -> Optional[datetime]:
+        """datetime for the given day, or None if the calendar has no such day"""
+        if year >= 1 and 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]:
+            return datetime(year, month, day)
         return None
     
     def _get_category(self, merchant: str) -> str:
         """Get category for merchant"""
         merchant_lower = merchant.lower()
-        return self.category_mapping.get(merchant_lower, 'Other')
+        return CATEGORY_MAPPING.get(merchant_lower, 'Other')
     
     def _calculate_confidence(self, merchant: str, amount: float, date: str) -> float:
         """Calculate confidence score for extraction"""
         confidence = 0.0
         
         # Merchant confidence
-        if merchant and merchant.lower() in self.merchant_patterns:
+        if merchant and merchant.lower() in MERCHANT_KEYWORDS:
             confidence += 0.4
         elif merchant:
             confidence += 0.2